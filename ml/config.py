@@ -17,6 +17,7 @@ ENGLISH_LANG_CODE = "eng_Latn"
 # Output directories for trained models
 OUTPUT_DIR_D2E = "./nllb-200-darija-en"  # Darija to English model
 OUTPUT_DIR_E2D = "./nllb-200-en-darija"  # English to Darija model
+OUTPUT_DIR_BIDIRECTIONAL = "./nllb-200-darija-en-bidirectional"  # Both directions
 
 # Training hyperparameters
 TRAINING_CONFIG = {
@@ -35,6 +36,42 @@ TRAINING_CONFIG = {
     "max_grad_norm": 1.0,
 }
 
+# Token-budget batching (opt-in): training batches are built from examples of
+# similar length and sized by padded tokens instead of a fixed number of
+# examples (per_device_train_batch_size is then only used for evaluation).
+# Gradient accumulation and the warmup/eval/save/logging steps are rescaled
+# from the resulting batch count so each update sees about as many examples,
+# and the run as many evaluations, as with fixed-size batches.
+TOKEN_BATCHING_CONFIG = {
+    "enabled": False,
+    "max_tokens": 256,  # Padded tokens per side (source or target) per batch
+}
+
+# Processes used to tokenize the dataset; results are cached by datasets.
+TOKENIZE_NUM_PROC = min(8, os.cpu_count() or 1)
+
+# Distillation: smaller students trained on teacher (fine-tuned model) outputs.
+# The encoder runs once per request but the decoder once per generated token,
+# so the student keeps more encoder than decoder layers.
+TEACHER_MODEL_D2E = HF_MODEL_D2E
+TEACHER_MODEL_E2D = HF_MODEL_E2D
+OUTPUT_DIR_D2E_STUDENT = "./nllb-200-darija-en-student"
+OUTPUT_DIR_E2D_STUDENT = "./nllb-200-en-darija-student"
+
+DISTILL_CONFIG = {
+    "encoder_layers": 6,
+    "decoder_layers": 3,
+    "teacher_batch_size": 32,
+    "latency_runs": 3,
+}
+
+DISTILL_TRAINING_CONFIG = {
+    **TRAINING_CONFIG,
+    "learning_rate": 1e-4,
+    "num_train_epochs": 6,
+    "warmup_steps": 500,
+}
+
 # Maximum sequence lengths
 MAX_INPUT_LENGTH = 128
 MAX_TARGET_LENGTH = 128
@@ -46,6 +83,11 @@ INFERENCE_CONFIG = {
     "early_stopping": True,
 }
 
+# Batched inference (inference.py --batch): sentences are read in chunks,
+# sorted by length within a chunk and translated in padded batches.
+INFERENCE_BATCH_SIZE = 32
+INFERENCE_CHUNK_SIZE = 1024
+
 # Test sentences for quick evaluation
 TEST_DARIJA_SENTENCES = [
     "كيف داير؟",
@@ -0,0 +1,348 @@
+import argparse
+import copy
+import json
+import os
+import re
+import time
+
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+import config
+from evaluation import score
+from train import (
+    load_and_split_dataset,
+    load_model_and_tokenizer,
+    tokenize_dataset,
+    train_model,
+)
+
+DIRECTIONS = {
+    "d2e": {
+        "label": "DARIJA TO ENGLISH",
+        "src_lang": config.DARIJA_LANG_CODE,
+        "tgt_lang": config.ENGLISH_LANG_CODE,
+        "src_field": "darija",
+        "tgt_field": "english",
+        "teacher": config.TEACHER_MODEL_D2E,
+        "output_dir": config.OUTPUT_DIR_D2E_STUDENT,
+    },
+    "e2d": {
+        "label": "ENGLISH TO DARIJA",
+        "src_lang": config.ENGLISH_LANG_CODE,
+        "tgt_lang": config.DARIJA_LANG_CODE,
+        "src_field": "english",
+        "tgt_field": "darija",
+        "teacher": config.TEACHER_MODEL_E2D,
+        "output_dir": config.OUTPUT_DIR_E2D_STUDENT,
+    },
+}
+
+LAYER_KEY = re.compile(r"^(.*\.(?:encoder|decoder)\.layers\.)(\d+)(\..*)$")
+
+
+def pick_layers(teacher_layers, student_layers):
+    # Evenly spaced, always keeping the first and the last layer.
+    if student_layers >= teacher_layers:
+        return list(range(teacher_layers))
+    if student_layers == 1:
+        return [teacher_layers - 1]
+    step = (teacher_layers - 1) / (student_layers - 1)
+    return [round(i * step) for i in range(student_layers)]
+
+
+def create_student(teacher, encoder_layers, decoder_layers):
+    student_config = copy.deepcopy(teacher.config)
+    student_config.encoder_layers = encoder_layers
+    student_config.decoder_layers = decoder_layers
+    # M2M100 keeps num_hidden_layers as a copy of encoder_layers; keep it
+    # consistent with the new depth for code that reads it.
+    student_config.num_hidden_layers = encoder_layers
+    student = AutoModelForSeq2SeqLM.from_config(student_config)
+
+    # Start from a subset of the teacher's layers rather than random weights;
+    # embeddings and everything outside the layer stacks are copied as is.
+    layer_maps = {
+        "encoder": pick_layers(teacher.config.encoder_layers, encoder_layers),
+        "decoder": pick_layers(teacher.config.decoder_layers, decoder_layers),
+    }
+    teacher_state = teacher.state_dict()
+
+    state = {}
+    for key in student.state_dict():
+        match = LAYER_KEY.match(key)
+        if match:
+            prefix, index, suffix = match.groups()
+            stack = "encoder" if ".encoder." in prefix else "decoder"
+            key_in_teacher = f"{prefix}{layer_maps[stack][int(index)]}{suffix}"
+        else:
+            key_in_teacher = key
+        state[key] = teacher_state[key_in_teacher]
+
+    student.load_state_dict(state)
+    print(
+        f"Student layers: encoder {layer_maps['encoder']}, "
+        f"decoder {layer_maps['decoder']}"
+    )
+    return student.to(teacher.device)
+
+
+def count_parameters(model):
+    return sum(parameter.numel() for parameter in model.parameters())
+
+
+def generate(model, tokenizer, texts, src_lang, tgt_lang, batch_size):
+    tokenizer.src_lang = src_lang
+    model.eval()
+
+    # Sorting by length keeps padding inside each batch small.
+    order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+    outputs = [None] * len(texts)
+
+    for start in range(0, len(order), batch_size):
+        indices = order[start : start + batch_size]
+        inputs = tokenizer(
+            [texts[index] for index in indices],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=config.MAX_INPUT_LENGTH,
+        ).to(model.device)
+
+        with torch.no_grad():
+            generated = model.generate(
+                **inputs,
+                forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
+                **config.INFERENCE_CONFIG,
+            )
+
+        for index, text in zip(
+            indices, tokenizer.batch_decode(generated, skip_special_tokens=True)
+        ):
+            outputs[index] = text.strip()
+
+        print(f"Generated {min(start + batch_size, len(order))}/{len(order)}")
+
+    return outputs
+
+
+def load_teacher_outputs(path, sources):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+
+    if [row["source"] for row in rows] != sources:
+        print(f"Ignoring stale teacher outputs in {path}")
+        return None
+
+    print(f"Reusing teacher outputs from {path}")
+    return [row["target"] for row in rows]
+
+
+def save_teacher_outputs(path, sources, targets):
+    with open(path, "w", encoding="utf-8") as f:
+        for source, target in zip(sources, targets):
+            f.write(
+                json.dumps({"source": source, "target": target}, ensure_ascii=False)
+                + "\n"
+            )
+
+
+def measure_latency(model, tokenizer, texts, src_lang, tgt_lang, runs):
+    tokenizer.src_lang = src_lang
+    model.eval()
+
+    durations = []
+    for text in texts:
+        inputs = tokenizer(text, return_tensors="pt").to(model.device)
+        for run in range(runs + 1):
+            start = time.perf_counter()
+            with torch.no_grad():
+                model.generate(
+                    **inputs,
+                    forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
+                    **config.INFERENCE_CONFIG,
+                )
+            # The first run warms up the model and is not counted.
+            if run:
+                durations.append(time.perf_counter() - start)
+
+    durations.sort()
+    return {
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2),
+        "p50_ms": round(durations[len(durations) // 2] * 1000, 2),
+        "p95_ms": round(durations[int(len(durations) * 0.95)] * 1000, 2),
+    }
+
+
+def distill(direction, teacher_id, output_dir, max_eval_samples):
+    settings = DIRECTIONS[direction]
+
+    print("\n" + "=" * 70)
+    print(f"DISTILLING: {settings['label']}")
+    print("=" * 70)
+
+    os.makedirs(output_dir, exist_ok=True)
+    dataset = load_and_split_dataset(config.DATA_FILE)
+
+    teacher, tokenizer = load_model_and_tokenizer(teacher_id)
+
+    # Sequence-level knowledge distillation: the student learns to reproduce
+    # the teacher's beam search output instead of the original references.
+    sources = list(dataset["train"][settings["src_field"]])
+    outputs_path = os.path.join(output_dir, "teacher_outputs.jsonl")
+    teacher_targets = load_teacher_outputs(outputs_path, sources)
+    if teacher_targets is None:
+        print("Generating teacher outputs for the training split...")
+        teacher_targets = generate(
+            teacher,
+            tokenizer,
+            sources,
+            settings["src_lang"],
+            settings["tgt_lang"],
+            config.DISTILL_CONFIG["teacher_batch_size"],
+        )
+        save_teacher_outputs(outputs_path, sources, teacher_targets)
+
+    dataset["train"] = (
+        dataset["train"]
+        .remove_columns(settings["tgt_field"])
+        .add_column(settings["tgt_field"], teacher_targets)
+    )
+
+    student = create_student(
+        teacher,
+        config.DISTILL_CONFIG["encoder_layers"],
+        config.DISTILL_CONFIG["decoder_layers"],
+    )
+
+    tokenized = tokenize_dataset(
+        dataset,
+        tokenizer,
+        src_lang=settings["src_lang"],
+        tgt_lang=settings["tgt_lang"],
+        src_field=settings["src_field"],
+        tgt_field=settings["tgt_field"],
+        desc=f"Tokenizing {settings['label'].lower()}",
+    )
+
+    train_model(
+        student,
+        tokenizer,
+        tokenized,
+        output_dir,
+        training_config=config.DISTILL_TRAINING_CONFIG,
+    )
+
+    # Quality is scored against the human references of the held-out split.
+    evaluation = dataset["test"]
+    if max_eval_samples:
+        evaluation = evaluation.select(range(min(max_eval_samples, len(evaluation))))
+    eval_sources = list(evaluation[settings["src_field"]])
+    references = list(evaluation[settings["tgt_field"]])
+
+    report = {"direction": direction, "teacher": teacher_id, "models": {}}
+    for name, model in (("teacher", teacher), ("student", student)):
+        hypotheses = generate(
+            model,
+            tokenizer,
+            eval_sources,
+            settings["src_lang"],
+            settings["tgt_lang"],
+            config.DISTILL_CONFIG["teacher_batch_size"],
+        )
+        report["models"][name] = {
+            "parameters": count_parameters(model),
+            "encoder_layers": model.config.encoder_layers,
+            "decoder_layers": model.config.decoder_layers,
+            **score(hypotheses, references),
+            "latency": measure_latency(
+                model,
+                tokenizer,
+                config.TEST_DARIJA_SENTENCES
+                if direction == "d2e"
+                else config.TEST_ENGLISH_SENTENCES,
+                settings["src_lang"],
+                settings["tgt_lang"],
+                config.DISTILL_CONFIG["latency_runs"],
+            ),
+        }
+
+    teacher_stats = report["models"]["teacher"]
+    student_stats = report["models"]["student"]
+    report["eval_samples"] = len(references)
+    report["speedup"] = round(
+        teacher_stats["latency"]["mean_ms"] / student_stats["latency"]["mean_ms"], 2
+    )
+    report["size_ratio"] = round(
+        student_stats["parameters"] / teacher_stats["parameters"], 3
+    )
+
+    report_path = os.path.join(output_dir, "final", "distillation_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Student saved to {output_dir}/final, report in {report_path}")
+
+    del teacher, student
+    torch.cuda.empty_cache() if torch.cuda.is_available() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Distill smaller Darija/English students from fine-tuned models"
+    )
+
+    parser.add_argument(
+        "direction",
+        choices=["d2e", "e2d", "both"],
+        help="Which model to distill",
+    )
+
+    parser.add_argument(
+        "--teacher",
+        type=str,
+        help="Teacher model identifier or path (only with a single direction)",
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Student output directory (only with a single direction)",
+    )
+
+    parser.add_argument(
+        "--max-eval-samples",
+        type=int,
+        help="Limit the held-out sentences scored for the report",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(config.DATA_FILE):
+        raise FileNotFoundError(f"Data file not found: {config.DATA_FILE}")
+
+    directions = ["d2e", "e2d"] if args.direction == "both" else [args.direction]
+    if len(directions) > 1 and (args.teacher or args.output_dir):
+        parser.error("--teacher and --output-dir need a single direction")
+
+    for direction in directions:
+        distill(
+            direction,
+            args.teacher or DIRECTIONS[direction]["teacher"],
+            args.output_dir or DIRECTIONS[direction]["output_dir"],
+            args.max_eval_samples,
+        )
+
+    print("\n" + "=" * 70)
+    print("DISTILLATION COMPLETE!")
+    print("Serve a student by pointing D2E_MODEL_ID / E2D_MODEL_ID at its final/")
+    print("directory, or use it as D2E_DRAFT_MODEL_ID / E2D_DRAFT_MODEL_ID.")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import sacrebleu
+import torch
+from transformers import AutoTokenizer
+
+import config
+from inference import TranslationModel
+from train import load_and_split_dataset
+
+DIRECTIONS = {
+    "d2e": {
+        "src_lang": config.DARIJA_LANG_CODE,
+        "tgt_lang": config.ENGLISH_LANG_CODE,
+        "src_field": "darija",
+        "tgt_field": "english",
+        "model": config.HF_MODEL_D2E,
+    },
+    "e2d": {
+        "src_lang": config.ENGLISH_LANG_CODE,
+        "tgt_lang": config.DARIJA_LANG_CODE,
+        "src_field": "english",
+        "tgt_field": "darija",
+        "model": config.HF_MODEL_E2D,
+    },
+}
+
+
+class CTranslate2Model:
+    def __init__(self, model_path, tokenizer_id, src_lang, tgt_lang, compute_type):
+        import ctranslate2
+
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_id)
+        self.tokenizer.src_lang = src_lang
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.translator = ctranslate2.Translator(
+            model_path,
+            device=self.device,
+            compute_type=compute_type,
+            intra_threads=torch.get_num_threads(),
+        )
+        self.tgt_lang = tgt_lang
+
+    def translate(self, text, max_length=None, num_beams=None):
+        return self.translate_batch([text], max_length, num_beams)[0]
+
+    def translate_batch(self, texts, max_length=None, num_beams=None, batch_size=None):
+        source = [
+            self.tokenizer.convert_ids_to_tokens(ids)
+            for ids in self.tokenizer(
+                texts, truncation=True, max_length=config.MAX_INPUT_LENGTH
+            )["input_ids"]
+        ]
+
+        # CTranslate2 splits the input into length-sorted batches itself.
+        results = self.translator.translate_batch(
+            source,
+            target_prefix=[[self.tgt_lang]] * len(texts),
+            beam_size=num_beams or config.INFERENCE_CONFIG["num_beams"],
+            max_decoding_length=max_length or config.INFERENCE_CONFIG["max_length"],
+            max_batch_size=batch_size or config.INFERENCE_BATCH_SIZE,
+        )
+
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0][1:]),
+                skip_special_tokens=True,
+            )
+            for result in results
+        ]
+
+
+def load_model(backend, model_id, tokenizer_id, settings, compute_type):
+    if backend == "ctranslate2":
+        return CTranslate2Model(
+            model_id,
+            tokenizer_id,
+            settings["src_lang"],
+            settings["tgt_lang"],
+            compute_type,
+        )
+
+    return TranslationModel(model_id, settings["src_lang"], settings["tgt_lang"])
+
+
+def score(hypotheses, references):
+    return {
+        "bleu": round(sacrebleu.corpus_bleu(hypotheses, [references]).score, 2),
+        "chrf": round(sacrebleu.corpus_chrf(hypotheses, [references]).score, 2),
+    }
+
+
+def latency_summary(durations):
+    durations = sorted(durations)
+
+    def percentile(fraction):
+        index = min(len(durations) - 1, int(len(durations) * fraction))
+        return round(durations[index] * 1000, 2)
+
+    return {
+        "samples": len(durations),
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def count_tokens(tokenizer, texts):
+    return sum(
+        len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]
+    )
+
+
+def synchronize():
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+
+def evaluate_direction(model, sources, references, args):
+    decoding = {"max_length": args.max_length, "num_beams": args.num_beams}
+
+    # Warm up kernels and allocator caches before anything is timed.
+    model.translate_batch(
+        sources[: args.batch_size], batch_size=args.batch_size, **decoding
+    )
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+    synchronize()
+    start = time.perf_counter()
+    hypotheses = model.translate_batch(sources, batch_size=args.batch_size, **decoding)
+    synchronize()
+    seconds = time.perf_counter() - start
+
+    generated_tokens = count_tokens(model.tokenizer, hypotheses)
+
+    # Latency is measured one sentence at a time, as an interactive request
+    # would be served, on a prefix of the split.
+    durations = []
+    for text in sources[: args.latency_samples]:
+        start = time.perf_counter()
+        model.translate(text, **decoding)
+        synchronize()
+        durations.append(time.perf_counter() - start)
+
+    report = {
+        "samples": len(sources),
+        **score(hypotheses, references),
+        "throughput": {
+            "batch_size": args.batch_size,
+            "seconds": round(seconds, 3),
+            "sentences_per_second": round(len(sources) / seconds, 2),
+            "source_tokens_per_second": round(
+                count_tokens(model.tokenizer, sources) / seconds, 1
+            ),
+            "generated_tokens_per_second": round(generated_tokens / seconds, 1),
+        },
+        "latency": latency_summary(durations) if durations else None,
+    }
+
+    if torch.cuda.is_available():
+        report["peak_cuda_memory_mb"] = round(
+            torch.cuda.max_memory_allocated() / 2**20, 1
+        )
+
+    return report, hypotheses
+
+
+def save_predictions(path, sources, references, hypotheses):
+    with open(path, "w", encoding="utf-8") as f:
+        for source, reference, hypothesis in zip(sources, references, hypotheses):
+            f.write(
+                json.dumps(
+                    {
+                        "source": source,
+                        "reference": reference,
+                        "hypothesis": hypothesis,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate translation quality and speed on the held-out split"
+    )
+
+    parser.add_argument(
+        "direction",
+        choices=["d2e", "e2d", "both"],
+        help="Which direction to evaluate",
+    )
+
+    parser.add_argument(
+        "--model-id",
+        type=str,
+        help="Model identifier or path; a bidirectional model can serve both "
+        "directions (CTranslate2: the converted model directory)",
+    )
+
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        help="Tokenizer identifier or path for CTranslate2 models "
+        "(default: the direction's default model)",
+    )
+
+    parser.add_argument(
+        "--backend",
+        choices=["torch", "ctranslate2"],
+        default="torch",
+        help="Inference backend",
+    )
+
+    parser.add_argument(
+        "--compute-type",
+        type=str,
+        default="int8",
+        help="CTranslate2 compute type",
+    )
+
+    parser.add_argument(
+        "--num-beams",
+        type=int,
+        default=config.INFERENCE_CONFIG["num_beams"],
+        help="Beam size (1 for greedy decoding)",
+    )
+
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        default=config.INFERENCE_CONFIG["max_length"],
+        help="Maximum generated length in tokens",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.INFERENCE_BATCH_SIZE,
+        help="Sentences per generate call for the throughput run",
+    )
+
+    parser.add_argument(
+        "--latency-samples",
+        type=int,
+        default=50,
+        help="Sentences translated one at a time for latency percentiles",
+    )
+
+    parser.add_argument(
+        "--max-samples",
+        type=int,
+        help="Limit the held-out sentences evaluated",
+    )
+
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="CPU threads used for inference",
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Also write the JSON report to this file",
+    )
+
+    parser.add_argument(
+        "--predictions-dir",
+        type=str,
+        help="Write source/reference/hypothesis JSONL per direction to this directory",
+    )
+
+    args = parser.parse_args()
+
+    if args.backend == "ctranslate2" and not args.model_id:
+        parser.error("--backend ctranslate2 needs --model-id (a converted model)")
+
+    if not os.path.exists(config.DATA_FILE):
+        raise FileNotFoundError(f"Data file not found: {config.DATA_FILE}")
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    # stdout only carries the JSON report.
+    with contextlib.redirect_stdout(sys.stderr):
+        evaluation = load_and_split_dataset(config.DATA_FILE)["test"]
+    if args.max_samples:
+        evaluation = evaluation.select(range(min(args.max_samples, len(evaluation))))
+
+    report = {
+        "config": {
+            "data_file": config.DATA_FILE,
+            "split_seed": config.RANDOM_SEED,
+            "backend": args.backend,
+            "compute_type": (
+                args.compute_type if args.backend == "ctranslate2" else None
+            ),
+            "num_beams": args.num_beams,
+            "max_length": args.max_length,
+            "batch_size": args.batch_size,
+            "threads": torch.get_num_threads(),
+            "device": "cuda" if torch.cuda.is_available() else "cpu",
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+        },
+        "directions": {},
+    }
+
+    directions = ["d2e", "e2d"] if args.direction == "both" else [args.direction]
+    for direction in directions:
+        settings = DIRECTIONS[direction]
+        model_id = args.model_id or settings["model"]
+
+        start = time.perf_counter()
+        model = load_model(
+            args.backend,
+            model_id,
+            args.tokenizer or settings["model"],
+            settings,
+            args.compute_type,
+        )
+        load_seconds = time.perf_counter() - start
+
+        sources = list(evaluation[settings["src_field"]])
+        references = list(evaluation[settings["tgt_field"]])
+        result, hypotheses = evaluate_direction(model, sources, references, args)
+
+        report["directions"][direction] = {
+            "model": model_id,
+            "load_seconds": round(load_seconds, 2),
+            **result,
+        }
+
+        if args.predictions_dir:
+            os.makedirs(args.predictions_dir, exist_ok=True)
+            save_predictions(
+                os.path.join(args.predictions_dir, f"{direction}.jsonl"),
+                sources,
+                references,
+                hypotheses,
+            )
+
+        del model
+        gc.collect()
+        torch.cuda.empty_cache() if torch.cuda.is_available() else None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS, and covers the
+    # whole process, so with "both" it is the larger of the two directions.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == "Darwin":
+        peak_rss //= 1024
+    report["peak_rss_mb"] = round(peak_rss / 1024, 1)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
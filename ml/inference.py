@@ -1,4 +1,8 @@
 import argparse
+import itertools
+import json
+import sys
+import time
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import config
@@ -20,40 +24,68 @@ class TranslationModel:
         self.src_lang = src_lang
         self.tgt_lang = tgt_lang
 
-        print(f"Model loaded from {model_id}")
-        print(f"Using device: {self.device}")
-        print(f"Translation: {src_lang} → {tgt_lang}")
+        # Status goes to stderr so that --batch output on stdout stays clean.
+        print(f"Model loaded from {model_id}", file=sys.stderr)
+        print(f"Using device: {self.device}", file=sys.stderr)
+        print(f"Translation: {src_lang} → {tgt_lang}", file=sys.stderr)
 
     def translate(self, text, max_length=None, num_beams=None, early_stopping=None):
+        # A single sentence is never truncated, so long interactive input
+        # is translated in full.
+        return self.translate_batch(
+            [text], max_length, num_beams, early_stopping, truncate=False
+        )[0]
+
+    def translate_batch(
+        self,
+        texts,
+        max_length=None,
+        num_beams=None,
+        early_stopping=None,
+        batch_size=None,
+        truncate=True,
+    ):
         if max_length is None:
             max_length = config.INFERENCE_CONFIG["max_length"]
         if num_beams is None:
             num_beams = config.INFERENCE_CONFIG["num_beams"]
         if early_stopping is None:
             early_stopping = config.INFERENCE_CONFIG["early_stopping"]
+        if batch_size is None:
+            batch_size = config.INFERENCE_BATCH_SIZE
 
         self.tokenizer.src_lang = self.src_lang
-
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.device)
-
-        generated = self.model.generate(
-            **inputs,
-            forced_bos_token_id=self.tokenizer.convert_tokens_to_ids(self.tgt_lang),
-            max_length=max_length,
-            num_beams=num_beams,
-            early_stopping=early_stopping,
-        )
-
-        return self.tokenizer.decode(generated[0], skip_special_tokens=True)
-
-    def translate_batch(
-        self, texts, max_length=None, num_beams=None, early_stopping=None
-    ):
-
-        return [
-            self.translate(text, max_length, num_beams, early_stopping)
-            for text in texts
-        ]
+        forced_bos_token_id = self.tokenizer.convert_tokens_to_ids(self.tgt_lang)
+
+        # Sentences of similar length share a batch to keep padding small;
+        # results are put back in input order.
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        translations = [""] * len(texts)
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            inputs = self.tokenizer(
+                [texts[index] for index in indices],
+                return_tensors="pt",
+                padding=True,
+                truncation=truncate,
+                max_length=config.MAX_INPUT_LENGTH if truncate else None,
+            ).to(self.device)
+
+            with torch.inference_mode():
+                generated = self.model.generate(
+                    **inputs,
+                    forced_bos_token_id=forced_bos_token_id,
+                    max_length=max_length,
+                    num_beams=num_beams,
+                    early_stopping=early_stopping,
+                )
+
+            decoded = self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+            for index, translation in zip(indices, decoded):
+                translations[index] = translation
+
+        return translations
 
 
 def load_darija_to_english_model(model_id=None):
@@ -74,6 +106,68 @@ def load_english_to_darija_model(model_id=None):
     )
 
 
+def read_records(stream, input_format, field):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip("\n")
+        if input_format == "jsonl":
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+                continue
+            if not isinstance(record, dict):
+                print(
+                    f"Skipping line {line_number}: not a JSON object",
+                    file=sys.stderr,
+                )
+                continue
+            yield record, (record.get(field) or "").strip()
+        else:
+            yield {"text": line}, line.strip()
+
+
+def write_record(stream, output_format, record, translation):
+    if output_format == "jsonl":
+        record = {**record, "translation": translation}
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        stream.write(translation.replace("\n", " ") + "\n")
+
+
+def translate_stream(
+    model, input_stream, output_stream, input_format, field, batch_size, chunk_size
+):
+    records = read_records(input_stream, input_format, field)
+    translated = 0
+    start = time.perf_counter()
+
+    # Only one chunk is held in memory; its results are written, in input
+    # order, as soon as it is translated.
+    while chunk := list(itertools.islice(records, chunk_size)):
+        texts = [text for _, text in chunk]
+        non_empty = [index for index, text in enumerate(texts) if text]
+        outputs = model.translate_batch(
+            [texts[index] for index in non_empty], batch_size=batch_size
+        )
+
+        translations = [""] * len(chunk)
+        for index, translation in zip(non_empty, outputs):
+            translations[index] = translation
+
+        for (record, _), translation in zip(chunk, translations):
+            write_record(output_stream, input_format, record, translation)
+        output_stream.flush()
+
+        translated += len(non_empty)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Translated {translated} sentences ({translated / elapsed:.1f}/s)",
+            file=sys.stderr,
+        )
+
+
 def interactive_mode(direction):
     print(f"\n{'=' * 70}")
     print(f"INTERACTIVE TRANSLATION MODE: {direction}")
@@ -133,7 +227,47 @@ def main():
     parser.add_argument(
         "--batch",
         action="store_true",
-        help="Translate multiple sentences (one per line from stdin)",
+        help="Translate multiple sentences from stdin or --input, one per line",
+    )
+
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="File to translate in batch mode (default: stdin)",
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="File to write batch translations to (default: stdout)",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["text", "jsonl"],
+        default="text",
+        help="Batch input and output format: plain lines, or JSON objects that "
+        "are written back with a 'translation' field",
+    )
+
+    parser.add_argument(
+        "--field",
+        type=str,
+        help="JSONL field to translate (default: 'darija' for d2e, 'english' for e2d)",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.INFERENCE_BATCH_SIZE,
+        help="Sentences per generate call in batch mode",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=config.INFERENCE_CHUNK_SIZE,
+        help="Sentences read, length-sorted and written at a time in batch mode",
     )
 
     args = parser.parse_args()
@@ -150,19 +284,36 @@ def main():
         print(f"{src_label}: {args.text}")
         print(f"{tgt_label}: {translation}")
 
-    elif args.batch:
-        print(f"Enter sentences to translate (one per line, Ctrl+D when done):")
-        import sys
+    elif args.batch or args.input:
+        if args.input is None and sys.stdin.isatty():
+            print(
+                "Enter sentences to translate (one per line, Ctrl+D when done):",
+                file=sys.stderr,
+            )
 
-        texts = [line.strip() for line in sys.stdin if line.strip()]
-        translations = model.translate_batch(texts)
+        field = args.field or ("darija" if args.direction == "d2e" else "english")
+        input_stream = (
+            open(args.input, encoding="utf-8") if args.input else sys.stdin
+        )
+        output_stream = (
+            open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        )
 
-        print(f"\n{'=' * 70}")
-        print("TRANSLATIONS")
-        print("=" * 70)
-        for text, translation in zip(texts, translations):
-            print(f"\n{src_label}: {text}")
-            print(f"{tgt_label}: {translation}")
+        try:
+            translate_stream(
+                model,
+                input_stream,
+                output_stream,
+                args.format,
+                field,
+                args.batch_size,
+                args.chunk_size,
+            )
+        finally:
+            if args.input:
+                input_stream.close()
+            if args.output:
+                output_stream.close()
 
     else:
         interactive_mode(args.direction)
@@ -1,6 +1,10 @@
+import argparse
 import os
+import time
 import torch
-from datasets import load_dataset
+from datasets import DatasetDict, concatenate_datasets, load_dataset
+from datasets.fingerprint import Hasher
+from torch.utils.data import DataLoader
 from transformers import (
     AutoTokenizer,
     AutoModelForSeq2SeqLM,
@@ -58,12 +62,242 @@ def create_preprocessing_function(tokenizer, src_lang, tgt_lang, src_field, tgt_
         )
 
         inputs["labels"] = labels["input_ids"]
+        inputs["length"] = [
+            max(len(source), len(target))
+            for source, target in zip(inputs["input_ids"], labels["input_ids"])
+        ]
         return inputs
 
     return preprocess
 
 
-def train_model(model, tokenizer, dataset, output_dir):
+def tokenize_dataset(
+    dataset, tokenizer, src_lang, tgt_lang, src_field, tgt_field, desc
+):
+    preprocess = create_preprocessing_function(
+        tokenizer,
+        src_lang=src_lang,
+        tgt_lang=tgt_lang,
+        src_field=src_field,
+        tgt_field=tgt_field,
+    )
+
+    # The tokenizer captured by preprocess changes state (src_lang) between
+    # calls, so datasets cannot fingerprint it reliably. The cache is keyed on
+    # what determines the output instead, and reused on the next run.
+    tokenized = {}
+    for split in dataset:
+        fingerprint = Hasher.hash(
+            [
+                dataset[split]._fingerprint,
+                tokenizer.name_or_path,
+                len(tokenizer),
+                src_lang,
+                tgt_lang,
+                src_field,
+                tgt_field,
+                config.MAX_INPUT_LENGTH,
+                config.MAX_TARGET_LENGTH,
+            ]
+        )
+        tokenized[split] = dataset[split].map(
+            preprocess,
+            batched=True,
+            remove_columns=dataset[split].column_names,
+            num_proc=config.TOKENIZE_NUM_PROC,
+            new_fingerprint=fingerprint,
+            desc=f"{desc} ({split})",
+        )
+
+    return DatasetDict(tokenized)
+
+
+class TokenBudgetBatchSampler:
+    def __init__(self, lengths, max_tokens, seed, pad_to_multiple_of=8):
+        self.lengths = [
+            -(-length // pad_to_multiple_of) * pad_to_multiple_of
+            for length in lengths
+        ]
+        self.max_tokens = max_tokens
+        self.seed = seed
+        self.epoch = 0
+
+        # Batch boundaries only depend on the sorted lengths, so the number of
+        # batches is the same in every epoch.
+        self.num_batches = len(
+            self._pack(sorted(range(len(lengths)), key=self.lengths.__getitem__))
+        )
+
+    def _pack(self, order):
+        batches = []
+        batch = []
+        longest = 0
+        for index in order:
+            length = max(longest, self.lengths[index])
+            if batch and length * (len(batch) + 1) > self.max_tokens:
+                batches.append(batch)
+                batch = []
+                length = self.lengths[index]
+            batch.append(index)
+            longest = length
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+
+        # Shuffle before the stable sort so examples of equal length land in
+        # different batches every epoch, then shuffle the batch order.
+        order = torch.randperm(len(self.lengths), generator=generator).tolist()
+        order.sort(key=self.lengths.__getitem__)
+        batches = self._pack(order)
+
+        for index in torch.randperm(len(batches), generator=generator).tolist():
+            yield batches[index]
+
+    def __len__(self):
+        return self.num_batches
+
+
+class TokenBudgetTrainer(Seq2SeqTrainer):
+    def __init__(self, *args, max_tokens=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_tokens = max_tokens
+
+        self.total_tokens = 0
+        self.total_padded_tokens = 0
+        self.training_seconds = 0.0
+
+        self._window_tokens = 0
+        self._window_padded_tokens = 0
+        self._window_start = None
+
+    def get_train_dataloader(self):
+        if self.max_tokens is None:
+            return super().get_train_dataloader()
+
+        dataset = self.train_dataset
+        sampler = TokenBudgetBatchSampler(
+            dataset["length"],
+            self.max_tokens,
+            seed=self.args.data_seed or self.args.seed,
+        )
+        print(f"Token-budget batching: {len(sampler)} batches per epoch")
+
+        dataloader = DataLoader(
+            self._remove_unused_columns(dataset, description="Training"),
+            batch_sampler=sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
+
+    def training_step(self, model, inputs, num_items_in_batch=None):
+        if self._window_start is None:
+            self._window_start = time.perf_counter()
+
+        # Kept as tensors so counting does not synchronize with the GPU.
+        source_mask = inputs["attention_mask"]
+        target_mask = inputs["labels"] != -100
+        self._window_tokens += source_mask.sum() + target_mask.sum()
+        self._window_padded_tokens += source_mask.numel() + target_mask.numel()
+
+        return super().training_step(model, inputs, num_items_in_batch)
+
+    def evaluate(self, *args, **kwargs):
+        # Evaluation time is not counted towards training throughput.
+        self._close_window()
+        return super().evaluate(*args, **kwargs)
+
+    def _close_window(self):
+        if self._window_start is None:
+            return None
+
+        seconds = time.perf_counter() - self._window_start
+        tokens = int(self._window_tokens)
+        padded_tokens = int(self._window_padded_tokens)
+
+        self.training_seconds += seconds
+        self.total_tokens += tokens
+        self.total_padded_tokens += padded_tokens
+
+        self._window_tokens = 0
+        self._window_padded_tokens = 0
+        self._window_start = None
+        return tokens, padded_tokens, seconds
+
+    def log(self, logs, start_time=None):
+        if "loss" in logs:
+            window = self._close_window()
+            if window is not None:
+                tokens, padded_tokens, seconds = window
+                logs["tokens_per_second"] = round(tokens / seconds, 1)
+                logs["padding_ratio"] = round(1 - tokens / padded_tokens, 4)
+        super().log(logs, start_time)
+
+    def throughput(self):
+        self._close_window()
+        if not self.training_seconds or not self.total_padded_tokens:
+            return None
+
+        return {
+            "tokens": self.total_tokens,
+            "tokens_per_second": round(self.total_tokens / self.training_seconds, 1),
+            "padding_ratio": round(1 - self.total_tokens / self.total_padded_tokens, 4),
+        }
+
+
+def scale_for_token_batching(training_config, num_examples, num_batches):
+    batch_size = training_config["per_device_train_batch_size"]
+    accumulation = training_config.get("gradient_accumulation_steps", 1)
+    examples_per_batch = num_examples / num_batches
+
+    # Keep about the same number of examples per optimizer update, then move
+    # the step-based settings so they fall at the same point of the run.
+    scaled_accumulation = max(
+        1, round(batch_size * accumulation / examples_per_batch)
+    )
+    ratio = (num_batches / scaled_accumulation) / (
+        num_examples / (batch_size * accumulation)
+    )
+
+    scaled = {**training_config, "gradient_accumulation_steps": scaled_accumulation}
+    for key in ("warmup_steps", "eval_steps", "save_steps", "logging_steps"):
+        if training_config.get(key):
+            scaled[key] = max(1, round(training_config[key] * ratio))
+
+    print(
+        f"Token-budget batching: {examples_per_batch:.1f} examples per batch, "
+        f"gradient_accumulation_steps={scaled_accumulation}, "
+        + ", ".join(
+            f"{key}={scaled[key]}"
+            for key in ("warmup_steps", "eval_steps", "save_steps", "logging_steps")
+            if key in scaled
+        )
+    )
+    return scaled
+
+
+def train_model(model, tokenizer, dataset, output_dir, training_config=None):
+    if training_config is None:
+        training_config = config.TRAINING_CONFIG
+
+    batching = config.TOKEN_BATCHING_CONFIG
+    if batching["enabled"]:
+        sampler = TokenBudgetBatchSampler(
+            dataset["train"]["length"], batching["max_tokens"], seed=0
+        )
+        training_config = scale_for_token_batching(
+            training_config, len(dataset["train"]), len(sampler)
+        )
+
     data_collator = DataCollatorForSeq2Seq(
         tokenizer=tokenizer, 
         model=model, 
@@ -79,21 +313,30 @@ def train_model(model, tokenizer, dataset, output_dir):
         load_best_model_at_end=True,
         metric_for_best_model="eval_loss",
         greater_is_better=False,
-        **config.TRAINING_CONFIG,
+        **training_config,
     )
 
-    trainer = Seq2SeqTrainer(
+    trainer = TokenBudgetTrainer(
         model=model,
         args=training_args,
         train_dataset=dataset["train"],
         eval_dataset=dataset["test"],
         processing_class=tokenizer,
         data_collator=data_collator,
+        max_tokens=batching["max_tokens"] if batching["enabled"] else None,
     )
 
     print(f"Starting training for {output_dir}...")
     trainer.train()
 
+    throughput = trainer.throughput()
+    if throughput:
+        print(
+            f"Trained on {throughput['tokens']} tokens: "
+            f"{throughput['tokens_per_second']} tokens/sec, "
+            f"{throughput['padding_ratio']:.1%} padding"
+        )
+
     final_dir = f"{output_dir}/final"
     trainer.save_model(final_dir)
     tokenizer.save_pretrained(final_dir)
@@ -124,7 +367,93 @@ def test_translation(model, tokenizer, src_lang, tgt_lang, test_sentences, direc
         print(f"{tgt_label}: {translation}")
 
 
+def train_bidirectional(dataset, output_dir):
+    print("\n" + "=" * 70)
+    print("TRAINING ONE MODEL: DARIJA TO ENGLISH AND ENGLISH TO DARIJA")
+    print("=" * 70)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    model, tokenizer = load_model_and_tokenizer()
+
+    # Every sentence pair is used in both directions. The source language
+    # token on the input and the forced target language token on the labels
+    # tell the model which way to translate.
+    tokenized_d2e = tokenize_dataset(
+        dataset,
+        tokenizer,
+        src_lang=config.DARIJA_LANG_CODE,
+        tgt_lang=config.ENGLISH_LANG_CODE,
+        src_field="darija",
+        tgt_field="english",
+        desc="Tokenizing Darija to English",
+    )
+
+    tokenized_e2d = tokenize_dataset(
+        dataset,
+        tokenizer,
+        src_lang=config.ENGLISH_LANG_CODE,
+        tgt_lang=config.DARIJA_LANG_CODE,
+        src_field="english",
+        tgt_field="darija",
+        desc="Tokenizing English to Darija",
+    )
+
+    tokenized = DatasetDict(
+        {
+            split: concatenate_datasets([tokenized_d2e[split], tokenized_e2d[split]])
+            for split in dataset
+        }
+    )
+    print(f"Bidirectional train samples: {len(tokenized['train'])}")
+
+    train_model(model, tokenizer, tokenized, output_dir)
+
+    test_translation(
+        model,
+        tokenizer,
+        config.DARIJA_LANG_CODE,
+        config.ENGLISH_LANG_CODE,
+        config.TEST_DARIJA_SENTENCES,
+        "DARIJA TO ENGLISH"
+    )
+
+    test_translation(
+        model,
+        tokenizer,
+        config.ENGLISH_LANG_CODE,
+        config.DARIJA_LANG_CODE,
+        config.TEST_ENGLISH_SENTENCES,
+        "ENGLISH TO DARIJA"
+    )
+
+    print("\n" + "=" * 70)
+    print("ALL TRAINING COMPLETE!")
+    print(f"Bidirectional model: {output_dir}/final")
+    print("Serve it by pointing BIDIRECTIONAL_MODEL_ID at that directory.")
+    print("=" * 70)
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Fine-tune NLLB-200 for Darija and English"
+    )
+
+    parser.add_argument(
+        "--bidirectional",
+        action="store_true",
+        help="Train a single model for both directions instead of one per direction",
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=config.OUTPUT_DIR_BIDIRECTIONAL,
+        help="Output directory of the bidirectional model",
+    )
+
+    args = parser.parse_args()
+
     print("=" * 70)
     print("BIDIRECTIONAL TRAINING: DARIJA AND ENGLISH")
     print("=" * 70)
@@ -134,6 +463,10 @@ def main():
 
     dataset = load_and_split_dataset(config.DATA_FILE)
 
+    if args.bidirectional:
+        train_bidirectional(dataset, args.output_dir)
+        return
+
     # Darija to English
     print("\n" + "=" * 70)
     print("TRAINING MODEL 1: DARIJA TO ENGLISH")
@@ -143,18 +476,13 @@ def main():
 
     model_d2e, tokenizer_d2e = load_model_and_tokenizer()
 
-    preprocess_d2e = create_preprocessing_function(
+    tokenized_d2e = tokenize_dataset(
+        dataset,
         tokenizer_d2e,
         src_lang=config.DARIJA_LANG_CODE,
         tgt_lang=config.ENGLISH_LANG_CODE,
         src_field="darija",
         tgt_field="english",
-    )
-
-    tokenized_d2e = dataset.map(
-        preprocess_d2e,
-        batched=True,
-        remove_columns=dataset["train"].column_names,
         desc="Tokenizing Darija to English",
     )
 
@@ -183,18 +511,13 @@ def main():
 
     model_e2d, tokenizer_e2d = load_model_and_tokenizer()
 
-    preprocess_e2d = create_preprocessing_function(
+    tokenized_e2d = tokenize_dataset(
+        dataset,
         tokenizer_e2d,
         src_lang=config.ENGLISH_LANG_CODE,
         tgt_lang=config.DARIJA_LANG_CODE,
         src_field="english",
         tgt_field="darija",
-    )
-
-    tokenized_e2d = dataset.map(
-        preprocess_e2d,
-        batched=True,
-        remove_columns=dataset["train"].column_names,
         desc="Tokenizing English to Darija",
     )
 
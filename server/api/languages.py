@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends
-from fastapi_limiter.depends import RateLimiter
 
+from core.rate_limit import RateLimiter
 from utils.languages import get_supported_languages
 
 router = APIRouter()
 
 
-@router.get("/languages", dependencies=[Depends(RateLimiter(times=30, seconds=60))])
+@router.get(
+    "/languages",
+    dependencies=[Depends(RateLimiter("languages", times=30, seconds=60))],
+)
 def languages():
     return get_supported_languages()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends, Response
+
+from core.auth import require_internal_token
+from core.metrics import render_metrics
+
+router = APIRouter(dependencies=[Depends(require_internal_token)])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
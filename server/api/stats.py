@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+
+from core.auth import require_internal_token
+from core.memory import get_memory_stats
+from core.rate_limit import get_rate_limit_stats
+from services.translation.cache import get_cache_stats
+from services.translation.hf_client import (
+    get_batching_stats,
+    get_inference_stats,
+    get_model_stats,
+)
+from services.translation.openai_client import get_openai_stats
+from services.translation.singleflight import get_singleflight_stats
+
+router = APIRouter(dependencies=[Depends(require_internal_token)])
+
+
+@router.get("/stats")
+def stats():
+    return {
+        "cache": get_cache_stats(),
+        "singleflight": get_singleflight_stats(),
+        "batching": get_batching_stats(),
+        "inference": get_inference_stats(),
+        "openai": get_openai_stats(),
+        "models": get_model_stats(),
+        "memory": get_memory_stats(),
+        "rate_limit": get_rate_limit_stats(),
+    }
@@ -1,30 +1,44 @@
+import json
+import logging
 from typing import Union
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from schemas.request import TranslateRequest
+from core.config import settings
+from core.rate_limit import RateLimiter
+from schemas.request import TranslateBatchRequest, TranslateRequest
 from schemas.response import (
+    TranslateBatchItem,
+    TranslateBatchResponse,
     TranslateMultiTextResponse,
     TranslateSingleTextResponse,
 )
-from services.translation.service import translate_text
+from services.translation.executor import InferenceQueueFull
+from services.translation.openai_client import OpenAIUnavailableError
+from services.translation.service import (
+    request_cost,
+    stream_translate_text,
+    translate_many,
+    translate_text,
+)
 from utils.languages import is_supported_language
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+BUSY_DETAIL = "Translation service is busy. Try again shortly."
+UNAVAILABLE_DETAIL = "Translation provider is unavailable. Try again later."
 
-@router.post(
-    "/translate",
-    dependencies=[Depends(RateLimiter(times=100, seconds=86400))],
+translate_rate_limiter = RateLimiter(
+    "translate",
+    times=settings.translate_rate_limit_requests,
+    seconds=86400,
 )
-def translate(
-    request: TranslateRequest,
-) -> Union[TranslateSingleTextResponse, TranslateMultiTextResponse]:
-    source = request.source_language
-    target = request.target_language
 
+
+def _validate_language_pair(source: str, target: str) -> JSONResponse | None:
     if not is_supported_language(source) or not is_supported_language(target):
         return JSONResponse(
             status_code=400,
@@ -41,11 +55,150 @@ def translate(
             status_code=400,
             content={"detail": "One of the languages must be Darija (ary)."},
         )
+
+    return None
+
+
+@router.post("/translate")
+async def translate(
+    http_request: Request,
+    http_response: Response,
+    request: TranslateRequest,
+) -> Union[TranslateSingleTextResponse, TranslateMultiTextResponse]:
+    source = request.source_language
+    target = request.target_language
+
+    error = _validate_language_pair(source, target)
+    if error:
+        return error
+
+    await translate_rate_limiter.consume(
+        http_request, http_response, cost=request_cost(request.text, request.mode)
+    )
+
     try:
-        return translate_text(
+        return await translate_text(
             source_language=source,
             target_language=target,
             text=request.text,
+            profile=request.profile,
+            mode=request.mode,
         )
     except ValueError as e:
         return JSONResponse(status_code=400, content={"detail": str(e)})
+    except InferenceQueueFull:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "1"},
+            content={"detail": BUSY_DETAIL},
+        )
+    except OpenAIUnavailableError:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(int(settings.openai_breaker_reset_seconds))},
+            content={"detail": UNAVAILABLE_DETAIL},
+        )
+
+
+@router.post("/translate/batch")
+async def translate_batch(
+    http_request: Request,
+    http_response: Response,
+    request: TranslateBatchRequest,
+) -> TranslateBatchResponse:
+    source = request.source_language
+    target = request.target_language
+
+    error = _validate_language_pair(source, target)
+    if error:
+        return error
+
+    # Every item counts against the same daily quota as /translate, so
+    # batching does not raise how much a client can translate.
+    await translate_rate_limiter.consume(
+        http_request, http_response, cost=len(request.texts)
+    )
+
+    results = await translate_many(
+        source_language=source,
+        target_language=target,
+        texts=request.texts,
+        profile=request.profile,
+    )
+
+    items = []
+    for index, result in enumerate(results):
+        if isinstance(result, ValueError):
+            items.append(TranslateBatchItem(index=index, error=str(result)))
+        elif isinstance(result, InferenceQueueFull):
+            items.append(TranslateBatchItem(index=index, error=BUSY_DETAIL))
+        elif isinstance(result, OpenAIUnavailableError):
+            items.append(TranslateBatchItem(index=index, error=UNAVAILABLE_DETAIL))
+        elif isinstance(result, BaseException):
+            logger.error(f"translate_batch_item_failed index={index}", exc_info=result)
+            items.append(TranslateBatchItem(index=index, error="Internal Server Error"))
+        else:
+            items.append(TranslateBatchItem(index=index, result=result))
+
+    return TranslateBatchResponse(results=items)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/translate/stream",
+    description=(
+        "Streams the translation as server-sent events. Token streaming only "
+        'supports greedy decoding, so streams always use the "fast" profile '
+        "and the requested profile is ignored."
+    ),
+)
+async def translate_stream(
+    http_request: Request,
+    http_response: Response,
+    request: TranslateRequest,
+):
+    source = request.source_language
+    target = request.target_language
+
+    error = _validate_language_pair(source, target)
+    if error:
+        return error
+
+    if request.mode == "document":
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Document mode is not supported for streaming."},
+        )
+
+    # Streams share the /translate quota, so they do not add to a client's
+    # daily budget.
+    await translate_rate_limiter.consume(
+        http_request, http_response, cost=request_cost(request.text, request.mode)
+    )
+
+    async def events():
+        try:
+            async for event, data in stream_translate_text(
+                source_language=source,
+                target_language=target,
+                text=request.text,
+            ):
+                yield _sse(event, data)
+        except ValueError as e:
+            yield _sse("error", {"status": 400, "detail": str(e)})
+        except InferenceQueueFull:
+            yield _sse("error", {"status": 503, "detail": BUSY_DETAIL})
+        except OpenAIUnavailableError:
+            yield _sse("error", {"status": 503, "detail": UNAVAILABLE_DETAIL})
+        except Exception:
+            logger.exception("translate_stream_failed")
+            yield _sse("error", {"status": 500, "detail": "Internal Server Error"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,237 @@
+# Compares assisted (draft model) greedy decoding with plain greedy decoding on
+# the test sentences from ml/config.py. Run from the server directory:
+#
+#     python -m benchmarks.assisted_decoding --d2e-draft ./draft-d2e --e2d-draft ./draft-e2d
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import time
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+from core.config import settings
+from services.translation.hf_client import translation_model_ids
+
+ML_CONFIG_PATH = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "ml", "config.py"
+)
+
+DIRECTIONS = {
+    "d2e": ("ary_Arab", "eng_Latn", "TEST_DARIJA_SENTENCES"),
+    "e2d": ("eng_Latn", "ary_Arab", "TEST_ENGLISH_SENTENCES"),
+}
+
+
+def load_test_sentences() -> dict[str, list[str]]:
+    spec = importlib.util.spec_from_file_location("ml_config", ML_CONFIG_PATH)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return {
+        direction: getattr(config, attribute)
+        for direction, (_, _, attribute) in DIRECTIONS.items()
+    }
+
+
+class ForwardCounter:
+    def __init__(self, model: torch.nn.Module):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def reset(self) -> None:
+        self.calls = 0
+
+    def remove(self) -> None:
+        self._handle.remove()
+
+
+def _load(model_id: str) -> torch.nn.Module:
+    return AutoModelForSeq2SeqLM.from_pretrained(model_id).eval()
+
+
+def _generate(model, tokenizer, text: str, tgt_lang: str, draft=None):
+    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+    with torch.no_grad():
+        return model.generate(
+            **inputs,
+            forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
+            max_new_tokens=int(inputs["input_ids"].shape[1] * 1.5) + 8,
+            num_beams=1,
+            do_sample=False,
+            assistant_model=draft,
+        )[0]
+
+
+def _timed(fn, repeat: int) -> tuple[float, object]:
+    result = fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def benchmark_direction(
+    model_id: str,
+    draft_id: str,
+    src_lang: str,
+    tgt_lang: str,
+    sentences: list[str],
+    repeat: int,
+    draft_tokens: int,
+    schedule: str,
+) -> dict:
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    tokenizer.src_lang = src_lang
+    model = _load(model_id)
+    draft = _load(draft_id)
+
+    if draft.config.vocab_size != model.config.vocab_size:
+        raise SystemExit(f"Draft model {draft_id} has a different vocabulary.")
+
+    target_passes = ForwardCounter(model)
+    draft_passes = ForwardCounter(draft)
+
+    baseline_seconds = 0.0
+    assisted_seconds = 0.0
+    identical = 0
+    generated = 0
+    rounds = 0
+    drafted = 0
+    rows = []
+
+    for text in sentences:
+        baseline_time, baseline = _timed(
+            lambda: _generate(model, tokenizer, text, tgt_lang), repeat
+        )
+
+        # The heuristic schedule adapts the draft length between calls;
+        # restart it for every sentence so runs are comparable.
+        def assisted_run():
+            draft.generation_config.num_assistant_tokens = draft_tokens
+            draft.generation_config.num_assistant_tokens_schedule = schedule
+            target_passes.reset()
+            draft_passes.reset()
+            return _generate(model, tokenizer, text, tgt_lang, draft)
+
+        assisted_time, assisted = _timed(assisted_run, repeat)
+
+        # The first position is the decoder start token, which is not generated.
+        new_tokens = assisted.shape[0] - 1
+        same = torch.equal(baseline, assisted)
+
+        baseline_seconds += baseline_time
+        assisted_seconds += assisted_time
+        identical += int(same)
+        generated += new_tokens
+        rounds += target_passes.calls
+        drafted += draft_passes.calls
+
+        rows.append(
+            {
+                "text": text,
+                "output": tokenizer.decode(assisted, skip_special_tokens=True),
+                "identical": same,
+                "new_tokens": new_tokens,
+                "target_passes": target_passes.calls,
+                "draft_passes": draft_passes.calls,
+                "baseline_ms": round(baseline_time * 1000, 2),
+                "assisted_ms": round(assisted_time * 1000, 2),
+            }
+        )
+
+    target_passes.remove()
+    draft_passes.remove()
+
+    # Every target pass verifies the pending draft and adds one token of its
+    # own, so the remaining tokens are accepted draft tokens.
+    accepted = max(0, generated - rounds)
+
+    return {
+        "model": model_id,
+        "draft_model": draft_id,
+        "sentences": len(sentences),
+        "identical": identical,
+        "acceptance_rate": round(accepted / drafted, 4) if drafted else 0.0,
+        "tokens_per_target_pass": round(generated / rounds, 3) if rounds else 0.0,
+        "baseline_ms": round(baseline_seconds * 1000, 2),
+        "assisted_ms": round(assisted_seconds * 1000, 2),
+        "speedup": (
+            round(baseline_seconds / assisted_seconds, 3) if assisted_seconds else 0.0
+        ),
+        "per_sentence": rows,
+    }
+
+
+def main():
+    model_ids = translation_model_ids()
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark assisted greedy decoding against plain greedy decoding"
+    )
+    parser.add_argument("--d2e-model", default=model_ids["d2e"])
+    parser.add_argument("--e2d-model", default=model_ids["e2d"])
+    parser.add_argument("--d2e-draft", default=settings.d2e_draft_model_id)
+    parser.add_argument("--e2d-draft", default=settings.e2d_draft_model_id)
+    parser.add_argument(
+        "--draft-tokens", type=int, default=settings.assisted_draft_tokens
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["heuristic", "constant"],
+        default=settings.assisted_draft_schedule,
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    drafts = {"d2e": args.d2e_draft, "e2d": args.e2d_draft}
+    models = {"d2e": args.d2e_model, "e2d": args.e2d_model}
+    if not any(drafts.values()):
+        parser.error("Pass --d2e-draft and/or --e2d-draft.")
+
+    sentences = load_test_sentences()
+    report = {
+        "config": {
+            "draft_tokens": args.draft_tokens,
+            "schedule": args.schedule,
+            "repeat": args.repeat,
+            "threads": torch.get_num_threads(),
+        },
+        "directions": {},
+    }
+
+    for direction, (src_lang, tgt_lang, _) in DIRECTIONS.items():
+        if not drafts[direction]:
+            continue
+        report["directions"][direction] = benchmark_direction(
+            models[direction],
+            drafts[direction],
+            src_lang,
+            tgt_lang,
+            sentences[direction],
+            args.repeat,
+            args.draft_tokens,
+            args.schedule,
+        )
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# Offline load test of the API against local stand-ins. Run from the server
+# directory (without --redis-url, fakeredis and lupa must be installed):
+#
+#     python -m benchmarks.load --concurrency 1,8,32 --requests 200
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.stand_ins import build_tiny_model, create_fake_openai_app
+
+CORPUS = {
+    "ary": [
+        "Salam, kidayr?",
+        "Ana mzyan, l7amdolillah.",
+        "Fin ghadi lyoum?",
+        "Bghit nmchi l bhar m3a s7abi.",
+        "Had lkhedma s3iba bzaf walakin ghadi nkmlha.",
+        "Wach kayn chi tobis kaymchi l mdina l9dima?",
+        "Ma3reftch ach ngolik, walakin ghadi nchouf.",
+        "Chokran bzaf 3la lmousa3ada dyalek.",
+    ],
+    "en": [
+        "Hello, how are you?",
+        "I am fine, thank you.",
+        "Where are you going today?",
+        "I want to go to the beach with my friends.",
+        "This job is very hard but I will finish it.",
+        "Is there a bus that goes to the old city?",
+        "I don't know what to tell you, but I will see.",
+        "Thank you very much for your help.",
+    ],
+    "fra": [
+        "Bonjour, comment ça va ?",
+        "Je vais bien, merci.",
+        "Où vas-tu aujourd'hui ?",
+        "Je veux aller à la plage avec mes amis.",
+        "Ce travail est très difficile mais je vais le finir.",
+        "Y a-t-il un bus qui va à la médina ?",
+        "Merci beaucoup pour ton aide.",
+    ],
+    "spa": [
+        "Hola, ¿cómo estás?",
+        "Estoy bien, gracias.",
+        "¿Adónde vas hoy?",
+        "Quiero ir a la playa con mis amigos.",
+        "Este trabajo es muy difícil pero lo terminaré.",
+        "Muchas gracias por tu ayuda.",
+    ],
+}
+
+# Target sizes in characters; "document" requests use document mode.
+LENGTHS = {"short": 25, "medium": 60, "long": 100, "document": 800}
+
+
+def _parse_weights(spec: str) -> dict[str, float]:
+    weights = {}
+    for entry in spec.split(","):
+        name, _, weight = entry.strip().partition("=")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app, port: int) -> tuple[uvicorn.Server, threading.Thread]:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 300
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} failed to start.")
+        time.sleep(0.05)
+
+    return server, thread
+
+
+def _make_text(rng: random.Random, language: str, length: int) -> str:
+    sentences = CORPUS[language]
+    text = rng.choice(sentences)
+    while True:
+        candidate = f"{text} {rng.choice(sentences)}"
+        if len(candidate) > length:
+            break
+        text = candidate
+    return text[: min(length, 100)] if length <= 100 else text
+
+
+def build_workload(
+    pairs: dict[str, float],
+    lengths: dict[str, float],
+    count: int,
+    seed: int,
+) -> list[dict]:
+    rng = random.Random(seed)
+    pair_names, pair_weights = zip(*pairs.items())
+    length_names, length_weights = zip(*lengths.items())
+
+    workload = []
+    for _ in range(count):
+        source, target = rng.choices(pair_names, pair_weights)[0].split(":")
+        length = rng.choices(length_names, length_weights)[0]
+        workload.append(
+            {
+                "text": _make_text(rng, source, LENGTHS[length]),
+                "source_language": source,
+                "target_language": target,
+                "mode": "document" if length == "document" else "text",
+            }
+        )
+    return workload
+
+
+def _parse_server_timing(header: str) -> dict[str, float]:
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "p99": _percentile(values, 0.99),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+async def run_level(
+    base_url: str,
+    workload: list[dict],
+    concurrency: int,
+    profile: str | None,
+) -> dict:
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for body in workload:
+        queue.put_nowait({**body, "profile": profile} if profile else body)
+
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {}
+    statuses: dict[str, int] = {}
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/translate", json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                response, status = None, type(exc).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+
+            statuses[status] = statuses.get(status, 0) + 1
+            if response is None or response.status_code != 200:
+                continue
+
+            latencies.append(elapsed)
+            timing = _parse_server_timing(response.headers.get("server-timing", ""))
+            for name, duration in timing.items():
+                stages.setdefault(name, []).append(duration)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=300
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(workload),
+        "ok": len(latencies),
+        "status_codes": dict(sorted(statuses.items())),
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": _summary(latencies),
+        "stages_ms": {name: _summary(values) for name, values in stages.items()},
+    }
+
+
+def _configure_environment(args, model_path: str, openai_url: str) -> None:
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": openai_url,
+            "REDIS_PASSWORD": "benchmark",
+            "CORS_ALLOWED_ORIGINS": "*",
+            "D2E_MODEL_ID": model_path,
+            "E2D_MODEL_ID": model_path,
+            "TRANSLITERATION_MODEL_ID": model_path,
+            "TRANSLITERATION_BACKEND": "local",
+            "TRACING_ENABLED": "true",
+            "TRACING_OTLP_ENABLED": "false",
+            "CACHE_ENABLED": str(args.cache).lower(),
+            "TRANSLATE_RATE_LIMIT_REQUESTS": str(10**9),
+            "HF_HUB_OFFLINE": "1",
+            "INTERNAL_API_TOKEN": "benchmark",
+        }
+    )
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+        return
+
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit(
+            "fakeredis (and lupa for the rate limiter scripts) is required, "
+            "or pass --redis-url to use a local Redis."
+        )
+
+    import redis.asyncio
+
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis.asyncio.from_url = lambda *args, **kwargs: fake
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end load test of the translation API"
+    )
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--pairs",
+        default="ary:en=3,en:ary=3,ary:fra=1,fra:ary=1",
+        help="Weighted source:target pairs.",
+    )
+    parser.add_argument(
+        "--lengths",
+        default="short=2,medium=2,long=1",
+        help=f"Weighted text lengths from {', '.join(LENGTHS)}.",
+    )
+    parser.add_argument("--profile", choices=["fast", "balanced", "quality"])
+    parser.add_argument("--cache", action="store_true", help="Keep caching on.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--model-dir",
+        default=os.path.join(tempfile.gettempdir(), "darija-benchmark-model"),
+    )
+    parser.add_argument("--d-model", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--openai-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--redis-url")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    pairs = _parse_weights(args.pairs)
+    lengths = _parse_weights(args.lengths)
+    for length in lengths:
+        if length not in LENGTHS:
+            parser.error(f"Unknown length {length!r}.")
+
+    model_path = build_tiny_model(
+        args.model_dir, d_model=args.d_model, layers=args.layers, seed=args.seed
+    )
+
+    openai_port = _free_port()
+    openai_server, _ = _serve(
+        create_fake_openai_app(
+            latency_ms=args.openai_latency_ms,
+            jitter_ms=args.openai_jitter_ms,
+            seed=args.seed,
+        ),
+        openai_port,
+    )
+
+    _configure_environment(args, model_path, f"http://127.0.0.1:{openai_port}/v1")
+
+    from main import app
+
+    app_port = _free_port()
+    app_server, _ = _serve(app, app_port)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    levels = []
+    try:
+        for index, concurrency in enumerate(
+            int(level) for level in args.concurrency.split(",")
+        ):
+            seed = args.seed + index
+            asyncio.run(
+                run_level(
+                    base_url,
+                    build_workload(pairs, lengths, args.warmup, seed + 1000),
+                    concurrency,
+                    args.profile,
+                )
+            )
+            levels.append(
+                asyncio.run(
+                    run_level(
+                        base_url,
+                        build_workload(pairs, lengths, args.requests, seed),
+                        concurrency,
+                        args.profile,
+                    )
+                )
+            )
+
+        server_stats = httpx.get(
+            f"{base_url}/api/stats", headers={"Authorization": "Bearer benchmark"}
+        ).json()
+    finally:
+        app_server.should_exit = True
+        openai_server.should_exit = True
+
+    report = {
+        "config": {
+            "pairs": pairs,
+            "lengths": lengths,
+            "requests": args.requests,
+            "profile": args.profile,
+            "cache": args.cache,
+            "seed": args.seed,
+            "model": {"d_model": args.d_model, "layers": args.layers},
+            "openai_latency_ms": args.openai_latency_ms,
+        },
+        "levels": levels,
+        "server": {
+            key: server_stats.get(key) for key in ("batching", "inference", "openai")
+        },
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
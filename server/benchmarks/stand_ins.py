@@ -0,0 +1,171 @@
+# Offline stand-ins for load tests: a tiny random NLLB-architecture model and a
+# fake OpenAI Responses API.
+
+import asyncio
+import json
+import os
+import random
+import string
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+NLLB_SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>"]
+NLLB_LANGUAGE_TOKENS = ["ary_Arab", "eng_Latn", "fra_Latn", "spa_Latn"]
+
+CHARACTERS = (
+    list(string.ascii_letters + string.digits + " .,!?'-")
+    + [chr(code) for code in range(0x0621, 0x064B)]
+    + ["؟", "،", "؛"]
+)
+
+
+def build_tiny_model(
+    path: str,
+    d_model: int = 64,
+    layers: int = 2,
+    seed: int = 0,
+) -> str:
+    # Random weights rarely stop early, so generation usually runs to
+    # max_new_tokens and timings are a worst case for the profile.
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import (
+        M2M100Config,
+        M2M100ForConditionalGeneration,
+        PreTrainedTokenizerFast,
+    )
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    tokens = NLLB_SPECIAL_TOKENS + NLLB_LANGUAGE_TOKENS + CHARACTERS
+    vocab = {token: index for index, token in enumerate(tokens)}
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="$A </s>", special_tokens=[("</s>", vocab["</s>"])]
+    )
+
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>",
+        eos_token="</s>",
+        pad_token="<pad>",
+        unk_token="<unk>",
+        additional_special_tokens=NLLB_LANGUAGE_TOKENS,
+        model_input_names=["input_ids", "attention_mask"],
+    )
+
+    config = M2M100Config(
+        vocab_size=len(vocab),
+        d_model=d_model,
+        encoder_layers=layers,
+        decoder_layers=layers,
+        encoder_attention_heads=max(1, d_model // 32),
+        decoder_attention_heads=max(1, d_model // 32),
+        encoder_ffn_dim=d_model * 2,
+        decoder_ffn_dim=d_model * 2,
+        max_position_embeddings=1024,
+        pad_token_id=vocab["<pad>"],
+        bos_token_id=vocab["<s>"],
+        eos_token_id=vocab["</s>"],
+        decoder_start_token_id=vocab["</s>"],
+    )
+
+    torch.manual_seed(seed)
+    model = M2M100ForConditionalGeneration(config)
+
+    os.makedirs(path, exist_ok=True)
+    model.save_pretrained(path)
+    fast_tokenizer.save_pretrained(path)
+    return path
+
+
+def create_fake_openai_app(
+    latency_ms: float = 300.0,
+    jitter_ms: float = 50.0,
+    stream_chunks: int = 8,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    def delay() -> float:
+        return max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000
+
+    def response_body(model: str, text: str, input_tokens: int) -> dict:
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": model,
+            "status": "completed",
+            "output": [
+                {
+                    "id": f"msg_{uuid.uuid4().hex}",
+                    "type": "message",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [
+                        {"type": "output_text", "text": text, "annotations": []}
+                    ],
+                }
+            ],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": len(text.split()),
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + len(text.split()),
+            },
+        }
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        payload = await request.json()
+        prompt = payload.get("input") or ""
+        model = payload.get("model", "fake")
+        text = " ".join(prompt.split()[-12:]) or "ok"
+        input_tokens = len(prompt.split())
+
+        if not payload.get("stream"):
+            await asyncio.sleep(delay())
+            return JSONResponse(response_body(model, text, input_tokens))
+
+        async def events():
+            words = text.split(" ")
+            per_chunk = max(1, len(words) // stream_chunks)
+            pause = delay() / max(1, len(words) / per_chunk)
+            sequence = 0
+            for start in range(0, len(words), per_chunk):
+                await asyncio.sleep(pause)
+                delta = " ".join(words[start : start + per_chunk]) + " "
+                event = {
+                    "type": "response.output_text.delta",
+                    "item_id": "msg_fake",
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": delta,
+                    "logprobs": [],
+                    "sequence_number": sequence,
+                }
+                sequence += 1
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+            event = {
+                "type": "response.completed",
+                "sequence_number": sequence,
+                "response": response_body(model, text, input_tokens),
+            }
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
@@ -0,0 +1,168 @@
+# Compares the precompiled Arabic->Latin transliteration with the previous
+# per-call implementation. Run from the server directory:
+#
+#     python -m benchmarks.transliteration --repeat 2000
+
+import argparse
+import json
+import re
+import timeit
+
+from services.translation.transliteration import (
+    transliterate_darija_arabic_to_latin,
+    transliterate_many,
+)
+
+CORPUS = [
+    "كيف داير؟",
+    "راه خاصنا نمشيو دابا",
+    "هاد الخدمة صعيبة بزاف",
+    "هوما مخبّين شي حاجة, أنا متيقّن!",
+    "غانمشي!",
+    "فين نقدر نلقى ريسطورة؟ أنا جوعان بزاف",
+    "واش كاين شي طوبيس كيمشي للمدينة القديمة؟",
+    "الله يعطيك الصحة، شكرا بزاف على المساعدة",
+    "ما عرفتش آش نقول ليك، ولكن غادي نشوف",
+    "السلام عليكم، لاباس عليك؟",
+    "إلى بغيتي تجي معانا، قول ليا من دابا",
+    "مشينا للبحر ف الصيف و كان الجو زوين",
+    "ـــ واخا ـــ غادي نتلاقاو غدا مع الأربعة",
+    "عندي موعد مع الطبيب ف الصباح",
+    "هادشي لي كاين، ما عندي ما نزيد",
+]
+
+
+def legacy_transliterate_darija_arabic_to_latin(text: str) -> str:
+    def normalize_arabic(text: str) -> str:
+        diacritics = re.compile(r"[\u064B-\u065F\u0670]")
+        text = diacritics.sub("", text)
+
+        text = text.replace("أ", "ا")
+        text = text.replace("إ", "ا")
+        text = text.replace("آ", "ا")
+        text = text.replace("ٱ", "ا")
+
+        text = text.replace("ى", "ي")
+        text = text.replace("ئ", "ي")
+
+        text = text.replace("ؤ", "و")
+
+        text = text.replace("ـ", "")
+
+        return text
+
+    arabic_to_english_map = {
+        "ا": "a",
+        "ء": "2",
+        "ب": "b",
+        "ت": "t",
+        "ة": "a",
+        "ث": "th",
+        "ج": "j",
+        "ح": "7",
+        "خ": "kh",
+        "د": "d",
+        "ذ": "dh",
+        "ر": "r",
+        "ز": "z",
+        "س": "s",
+        "ش": "sh",
+        "ص": "s",
+        "ض": "d",
+        "ط": "t",
+        "ظ": "z",
+        "ع": "3",
+        "غ": "gh",
+        "ف": "f",
+        "ق": "9",
+        "ك": "k",
+        "ل": "l",
+        "م": "m",
+        "ن": "n",
+        "ه": "h",
+        "و": "ou",
+        "ي": "i",
+        "لا": "la",
+        " ": " ",
+        "؟": "?",
+        "،": ",",
+        "؛": ";",
+        "!": "!",
+        ".": ".",
+        ":": ":",
+        "-": "-",
+        "(": "(",
+        ")": ")",
+    }
+
+    normalized_text = normalize_arabic(text)
+
+    result = []
+    i = 0
+
+    while i < len(normalized_text):
+        matched = False
+
+        for length in range(3, 0, -1):
+            if i + length <= len(normalized_text):
+                substring = normalized_text[i : i + length]
+                if substring in arabic_to_english_map:
+                    result.append(arabic_to_english_map[substring])
+                    i += length
+                    matched = True
+                    break
+
+        if not matched:
+            char = normalized_text[i]
+            if char in arabic_to_english_map:
+                result.append(arabic_to_english_map[char])
+            else:
+                result.append(char)
+            i += 1
+
+    return "".join(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the Arabic->Latin transliteration implementations"
+    )
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    for sentence in CORPUS:
+        expected = legacy_transliterate_darija_arabic_to_latin(sentence)
+        actual = transliterate_darija_arabic_to_latin(sentence)
+        if expected != actual:
+            raise AssertionError(
+                f"Mismatch for {sentence!r}: {expected!r} != {actual!r}"
+            )
+
+    legacy = timeit.timeit(
+        lambda: [legacy_transliterate_darija_arabic_to_latin(s) for s in CORPUS],
+        number=args.repeat,
+    )
+    current = timeit.timeit(
+        lambda: [transliterate_darija_arabic_to_latin(s) for s in CORPUS],
+        number=args.repeat,
+    )
+    batched = timeit.timeit(lambda: transliterate_many(CORPUS), number=args.repeat)
+
+    sentences = len(CORPUS) * args.repeat
+    print(
+        json.dumps(
+            {
+                "sentences": sentences,
+                "legacy_us_per_sentence": round(legacy / sentences * 1e6, 3),
+                "current_us_per_sentence": round(current / sentences * 1e6, 3),
+                "batched_us_per_sentence": round(batched / sentences * 1e6, 3),
+                "speedup": round(legacy / current, 2),
+                "batched_speedup": round(legacy / batched, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
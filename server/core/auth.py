@@ -0,0 +1,21 @@
+import secrets
+
+from fastapi import HTTPException, Request
+
+from core.config import settings
+
+
+def require_internal_token(request: Request) -> None:
+    # Internal endpoints do not exist unless a token is configured.
+    if not settings.internal_api_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode("utf-8"), settings.internal_api_token.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Unauthorized",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
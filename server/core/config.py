@@ -1,15 +1,79 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
+ProfileName = Literal["fast", "balanced", "quality"]
+
 
 class Settings(BaseSettings):
     openai_api_key: str
     redis_password: str
+    redis_url: str | None = None
+    redis_max_connections: int = 32
+    redis_socket_timeout_seconds: float = 1.0
     cors_allowed_origins: str
     d2e_model_id: str = "mwkhettab/nllb-200-darjia-en"
     e2d_model_id: str = "mwkhettab/nllb-200-en-darija"
+    bidirectional_model_id: str | None = None
     translation_model_id: str = "facebook/nllb-200-distilled-600M"
+    assisted_decoding_enabled: bool = False
+    d2e_draft_model_id: str | None = None
+    e2d_draft_model_id: str | None = None
+    assisted_draft_tokens: int = 5
+    assisted_draft_schedule: Literal["heuristic", "constant"] = "heuristic"
     transliteration_model_id: str = "atlasia/Transliteration-Moroccan-Darija"
+    transliteration_backend: Literal["local", "openai"] = "local"
+    pivot_backend: Literal["openai", "nllb"] = "openai"
+    pivot_openai_refinement: bool = False
     environment: str = "development"
+    openai_translation_model: str = "gpt-4.1"
+    openai_transliteration_model: str = "gpt-4.1-mini"
+    openai_base_url: str | None = None
+    openai_max_concurrency: int = 32
+    openai_max_connections: int = 32
+    openai_max_keepalive_connections: int = 8
+    openai_keepalive_expiry_seconds: float = 60.0
+    openai_max_retries: int = 1
+    openai_translate_timeout_seconds: float = 30.0
+    openai_transliterate_timeout_seconds: float = 10.0
+    openai_hedge_enabled: bool = False
+    openai_hedge_min_delay_seconds: float = 0.5
+    openai_hedge_min_samples: int = 20
+    openai_breaker_failure_threshold: int = 5
+    openai_breaker_reset_seconds: float = 30.0
+    document_max_chars: int = 5000
+    document_max_sentences: int = 64
+    document_max_sentence_chars: int = 200
+    translate_rate_limit_requests: int = 100
+    rate_limit_lease_size: int = 10
+    rate_limit_redis_retry_seconds: float = 5.0
+    translate_batch_max_items: int = 50
+    cache_enabled: bool = True
+    cache_max_entries: int = 10000
+    cache_ttl_seconds: float = 3600.0
+    cache_redis_enabled: bool = True
+    cache_redis_ttl_seconds: int = 604800
+    singleflight_enabled: bool = True
+    singleflight_redis_enabled: bool = False
+    singleflight_lock_ttl_ms: int = 10000
+    singleflight_poll_interval_ms: int = 50
+    inference_backend: Literal["torch", "ctranslate2"] = "torch"
+    ct2_model_dir: str = "ct2_models"
+    ct2_compute_type: str = "int8"
+    ct2_intra_threads: int = 0
+    decoding_default_profile: ProfileName = "quality"
+    decoding_adaptive: bool = True
+    decoding_downgrade_queue_depth: int = 16
+    batch_max_size: int = 8
+    batch_max_wait_ms: float = 10.0
+    tracing_enabled: bool = False
+    tracing_otlp_enabled: bool = False
+    tracing_service_name: str = "darija-translator"
+    internal_api_token: str | None = None
+    gunicorn_workers: int = 2
+    preload_models: bool = True
+    inference_max_workers: int = 1
+    inference_max_queue_size: int = 64
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,47 @@
+import os
+import resource
+
+SMAPS_ROLLUP_PATH = "/proc/self/smaps_rollup"
+
+SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+    "Anonymous": "anonymous_mb",
+}
+
+
+def _read_smaps_rollup() -> dict[str, float] | None:
+    try:
+        with open(SMAPS_ROLLUP_PATH) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    stats = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            stats[SMAPS_FIELDS[parts[0].rstrip(":")]] = round(int(parts[1]) / 1024, 1)
+    return stats
+
+
+def get_memory_stats() -> dict:
+    stats = _read_smaps_rollup()
+
+    if stats is None:
+        # Linux reports ru_maxrss in KiB, macOS in bytes.
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        return {"pid": os.getpid(), "max_rss_mb": round(max_rss / divisor, 1)}
+
+    stats["shared_mb"] = round(
+        stats.get("shared_clean_mb", 0.0) + stats.get("shared_dirty_mb", 0.0), 1
+    )
+    stats["private_mb"] = round(
+        stats.get("private_clean_mb", 0.0) + stats.get("private_dirty_mb", 0.0), 1
+    )
+    return {"pid": os.getpid(), "ppid": os.getppid(), **stats}
@@ -0,0 +1,148 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+http_request_seconds = Histogram(
+    "darija_http_request_seconds",
+    "HTTP request duration.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+http_requests_in_flight = Gauge(
+    "darija_http_requests_in_flight",
+    "HTTP requests currently being processed.",
+    multiprocess_mode="livesum",
+)
+
+pipeline_seconds = Histogram(
+    "darija_pipeline_seconds",
+    "End-to-end translation pipeline duration.",
+    ["pipeline", "source_language", "target_language", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+pipeline_stage_seconds = Histogram(
+    "darija_pipeline_stage_seconds",
+    "Duration of a single translation pipeline stage.",
+    ["pipeline", "stage", "source_language", "target_language", "backend"],
+    buckets=LATENCY_BUCKETS,
+)
+
+openai_errors_total = Counter(
+    "darija_openai_errors_total",
+    "OpenAI requests that raised an error.",
+    ["stage", "model", "error"],
+)
+
+openai_tokens_total = Counter(
+    "darija_openai_tokens_total",
+    "Tokens consumed by OpenAI requests.",
+    ["stage", "model", "kind"],
+)
+
+openai_hedged_total = Counter(
+    "darija_openai_hedged_total",
+    "OpenAI requests that started a second, hedged attempt.",
+    ["stage", "winner"],
+)
+
+openai_circuit_open = Gauge(
+    "darija_openai_circuit_open",
+    "Whether the OpenAI circuit breaker is open (1) or not (0).",
+    multiprocess_mode="livemax",
+)
+
+degraded_responses_total = Counter(
+    "darija_degraded_responses_total",
+    "Translations served from local models only because OpenAI was unavailable.",
+    ["pipeline"],
+)
+
+rate_limit_decisions_total = Counter(
+    "darija_rate_limit_decisions_total",
+    "Rate limit checks by where they were decided.",
+    ["limiter", "source"],
+)
+
+singleflight_coalesced_total = Counter(
+    "darija_singleflight_coalesced_total",
+    "Requests served by an identical request already in flight.",
+    ["flight", "scope"],
+)
+
+model_loaded = Gauge(
+    "darija_model_loaded",
+    "Whether a model is loaded in this worker (1) or not (0).",
+    ["model", "backend"],
+    multiprocess_mode="livemax",
+)
+
+
+def observe_stage(
+    pipeline: str,
+    stage: str,
+    source_language: str,
+    target_language: str,
+    backend: str,
+    seconds: float,
+) -> None:
+    pipeline_stage_seconds.labels(
+        pipeline=pipeline,
+        stage=stage,
+        source_language=source_language,
+        target_language=target_language,
+        backend=backend,
+    ).observe(seconds)
+
+
+@contextmanager
+def pipeline_timer(pipeline: str, source_language: str, target_language: str):
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        pipeline_seconds.labels(
+            pipeline=pipeline,
+            source_language=source_language,
+            target_language=target_language,
+            status=status,
+        ).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    # Under gunicorn every worker has its own registry, PROMETHEUS_MULTIPROC_DIR
+    # lets any worker report the aggregate.
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,210 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, Response
+from redis.exceptions import RedisError
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+
+from core.config import settings
+from core.metrics import rate_limit_decisions_total
+from core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Grants between `need` and `want` tokens from the current window in a single
+# round trip, or nothing if fewer than `need` are left.
+LEASE_SCRIPT = """local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local need = tonumber(ARGV[3])
+local want = tonumber(ARGV[4])
+
+local current = tonumber(redis.call("GET", key) or "0")
+local ttl = redis.call("PTTL", key)
+if ttl < 0 then
+    ttl = window
+end
+
+local granted = math.min(want, limit - current)
+if granted < need then
+    return {0, ttl}
+end
+
+if current > 0 then
+    redis.call("INCRBY", key, granted)
+else
+    redis.call("SET", key, granted, "PX", window)
+end
+return {granted, ttl}"""
+
+_MAX_LOCAL_KEYS = 4096
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    expires_at: float
+
+
+def _client_ip(request: Request) -> str:
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _retry_after(expires_at: float) -> str:
+    return str(max(1, math.ceil(expires_at - time.monotonic())))
+
+
+class RateLimiter:
+    def __init__(self, name: str, times: int, seconds: int):
+        self.name = name
+        self.times = times
+        self.milliseconds = seconds * 1000
+
+        # At most a tenth of the quota sits unused in one worker's lease, so
+        # a client moving between workers is not rejected much early.
+        self.lease_size = max(1, min(settings.rate_limit_lease_size, times // 10))
+
+        self._leases: dict[str, _Lease] = {}
+        self._fallback: dict[str, _Lease] = {}
+        self._script = None
+        self._script_redis = None
+
+    async def __call__(self, request: Request, response: Response):
+        await self.consume(request, response, cost=1)
+
+    async def consume(self, request: Request, response: Response, cost: int):
+        key = f"ratelimit:{self.name}:{_client_ip(request)}"
+        now = time.monotonic()
+
+        lease = self._leases.get(key)
+        if lease is not None and lease.expires_at > now and lease.tokens >= cost:
+            lease.tokens -= cost
+            rate_limit_decisions_total.labels(limiter=self.name, source="lease").inc()
+            return
+
+        redis_client = get_redis_client()
+        if redis_client is None or not _redis_backoff.ready(now):
+            self._consume_fallback(key, cost, now)
+            return
+
+        # Take what is left of the lease out while awaiting Redis, so that
+        # concurrent requests for the same key cannot spend it twice.
+        available = 0
+        if lease is not None and lease.expires_at > now:
+            available, lease.tokens = lease.tokens, 0
+
+        need = cost - available
+        try:
+            granted, ttl = await self._lease_script(redis_client)(
+                keys=[key],
+                args=[
+                    self.times,
+                    self.milliseconds,
+                    need,
+                    max(need, self.lease_size),
+                ],
+            )
+        except RedisError as exc:
+            if lease is not None:
+                lease.tokens += available
+            _redis_backoff.failed(exc)
+            self._consume_fallback(key, cost, now)
+            return
+
+        _redis_backoff.recovered()
+        expires_at = now + int(ttl) / 1000
+
+        if not granted:
+            if lease is not None:
+                lease.tokens += available
+            rate_limit_decisions_total.labels(
+                limiter=self.name, source="rejected"
+            ).inc()
+            raise HTTPException(
+                HTTP_429_TOO_MANY_REQUESTS,
+                "Too Many Requests",
+                headers={"Retry-After": _retry_after(expires_at)},
+            )
+
+        rate_limit_decisions_total.labels(limiter=self.name, source="redis").inc()
+        tokens = available + int(granted) - cost
+
+        current = self._leases.get(key)
+        if current is not None and current.expires_at > now:
+            current.tokens += tokens
+            current.expires_at = expires_at
+        else:
+            self._prune(self._leases, now)
+            self._leases[key] = _Lease(tokens, expires_at)
+
+    def _lease_script(self, redis_client):
+        if self._script is None or self._script_redis is not redis_client:
+            self._script = redis_client.register_script(LEASE_SCRIPT)
+            self._script_redis = redis_client
+        return self._script
+
+    def _consume_fallback(self, key: str, cost: int, now: float) -> None:
+        # Without Redis each worker enforces the limit on its own.
+        window = self._fallback.get(key)
+        if window is None or window.expires_at <= now:
+            self._prune(self._fallback, now)
+            window = _Lease(self.times, now + self.milliseconds / 1000)
+            self._fallback[key] = window
+
+        if window.tokens < cost:
+            rate_limit_decisions_total.labels(
+                limiter=self.name, source="rejected"
+            ).inc()
+            raise HTTPException(
+                HTTP_429_TOO_MANY_REQUESTS,
+                "Too Many Requests",
+                headers={"Retry-After": _retry_after(window.expires_at)},
+            )
+
+        window.tokens -= cost
+        rate_limit_decisions_total.labels(limiter=self.name, source="fallback").inc()
+
+    @staticmethod
+    def _prune(entries: dict[str, _Lease], now: float) -> None:
+        if len(entries) < _MAX_LOCAL_KEYS:
+            return
+        for key in [key for key, lease in entries.items() if lease.expires_at <= now]:
+            del entries[key]
+
+
+class _RedisBackoff:
+    # After a Redis error the limiters stay on the in-process fallback for a
+    # while instead of paying a connect timeout on every request.
+    def __init__(self):
+        self.retry_at = 0.0
+        self.failures = 0
+
+    def ready(self, now: float) -> bool:
+        return now >= self.retry_at
+
+    def failed(self, exc: Exception) -> None:
+        if self.retry_at == 0.0:
+            logger.warning(f"rate_limit_redis_unavailable error={exc}")
+        self.failures += 1
+        self.retry_at = time.monotonic() + settings.rate_limit_redis_retry_seconds
+
+    def recovered(self) -> None:
+        if self.retry_at:
+            logger.info("rate_limit_redis_recovered")
+        self.retry_at = 0.0
+
+
+_redis_backoff = _RedisBackoff()
+
+
+def get_rate_limit_stats() -> dict:
+    return {
+        "lease_size": settings.rate_limit_lease_size,
+        "redis_available": _redis_backoff.retry_at == 0.0,
+        "redis_failures": _redis_backoff.failures,
+    }
@@ -0,0 +1,12 @@
+import redis.asyncio as redis
+
+redis_client: redis.Redis | None = None
+
+
+def set_redis_client(client: redis.Redis | None) -> None:
+    global redis_client
+    redis_client = client
+
+
+def get_redis_client() -> redis.Redis | None:
+    return redis_client
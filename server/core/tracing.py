@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    attributes: dict
+
+
+@dataclass
+class Trace:
+    request_id: str
+    start: float = field(default_factory=time.perf_counter)
+    start_ns: int = field(default_factory=time.time_ns)
+    spans: list[Span] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def server_timing(self, total: float | None = None) -> str:
+        intervals: dict[str, list[tuple[float, float]]] = {}
+        with self.lock:
+            for span in self.spans:
+                intervals.setdefault(span.name, []).append(
+                    (span.start, span.start + span.duration)
+                )
+
+        # Concurrent spans of the same stage (e.g. batch items) are merged so
+        # each entry reports wall-clock time rather than a sum.
+        entries = []
+        for name, spans in intervals.items():
+            elapsed, covered_until = 0.0, float("-inf")
+            for start, end in sorted(spans):
+                start = max(start, covered_until)
+                if end > start:
+                    elapsed += end - start
+                    covered_until = end
+            entries.append(f"{name};dur={elapsed * 1000:.1f}")
+
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# A tuple rather than a single trace: work done on behalf of a micro-batch
+# belongs to every request that contributed an item to it.
+_active_traces: ContextVar[tuple[Trace, ...]] = ContextVar("active_traces", default=())
+
+_tracer = None
+_otlp_unavailable = False
+
+
+def start_trace(request_id: str) -> Trace | None:
+    if not settings.tracing_enabled:
+        return None
+
+    trace = Trace(request_id=request_id)
+    _active_traces.set((trace,))
+    return trace
+
+
+def current_traces() -> tuple[Trace, ...]:
+    return _active_traces.get()
+
+
+@contextmanager
+def use_traces(traces: tuple[Trace, ...]):
+    token = _active_traces.set(traces)
+    try:
+        yield
+    finally:
+        _active_traces.reset(token)
+
+
+def record_span(name: str, start: float, duration: float, **attributes) -> None:
+    recorded = Span(name, start, duration, attributes)
+    for trace in _active_traces.get():
+        trace.add(recorded)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    if not _active_traces.get():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, start, time.perf_counter() - start, **attributes)
+
+
+def _get_tracer():
+    global _tracer
+
+    if _tracer is None:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.tracing_service_name})
+        )
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        otel_trace.set_tracer_provider(provider)
+        _tracer = otel_trace.get_tracer(__name__)
+
+    return _tracer
+
+
+def export_trace(trace: Trace, name: str, attributes: dict) -> None:
+    global _otlp_unavailable
+
+    if not settings.tracing_otlp_enabled or _otlp_unavailable:
+        return
+
+    try:
+        tracer = _get_tracer()
+    except Exception as exc:
+        logger.warning(f"otlp_exporter_unavailable error={exc}")
+        _otlp_unavailable = True
+        return
+
+    from opentelemetry import trace as otel_trace
+
+    def to_ns(perf: float) -> int:
+        return trace.start_ns + int((perf - trace.start) * 1e9)
+
+    root = tracer.start_span(
+        name,
+        start_time=trace.start_ns,
+        attributes={"request_id": trace.request_id, **attributes},
+    )
+    context = otel_trace.set_span_in_context(root)
+
+    with trace.lock:
+        spans = list(trace.spans)
+
+    for recorded in spans:
+        child = tracer.start_span(
+            recorded.name,
+            context=context,
+            start_time=to_ns(recorded.start),
+            attributes=recorded.attributes,
+        )
+        child.end(end_time=to_ns(recorded.start + recorded.duration))
+
+    root.end(end_time=time.time_ns())
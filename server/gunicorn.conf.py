@@ -0,0 +1,49 @@
+import gc
+import logging
+import os
+import tempfile
+
+from core.config import settings
+
+# Must be set before prometheus_client is imported so that every worker writes
+# its metrics to a shared directory and /metrics reports the aggregate.
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "darija-translator-metrics"),
+)
+os.makedirs(prometheus_dir, exist_ok=True)
+
+bind = "0.0.0.0:8000"
+workers = settings.gunicorn_workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def on_starting(server):
+    # Drop metrics left over from a previous run. The preloaded app has already
+    # created this process's files, so those are kept.
+    own_suffix = f"_{os.getpid()}.db"
+    for name in os.listdir(prometheus_dir):
+        if not name.endswith(own_suffix):
+            os.remove(os.path.join(prometheus_dir, name))
+
+
+def when_ready(server):
+    if not settings.preload_models:
+        return
+
+    from services.translation.hf_client import preload_models
+
+    logging.info("Preloading models before forking workers...")
+    preload_models()
+
+    # Keep the collector from touching (and un-sharing) pages of objects
+    # inherited from the master.
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -4,15 +4,20 @@ from contextlib import asynccontextmanager
 import asyncio
 
 import redis.asyncio as redis
+from redis.exceptions import RedisError
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_limiter import FastAPILimiter
 
 from services.translation.hf_client import init_models
+from services.translation.openai_client import close_client as close_openai_client
 from api.health import router as health_router
 from api.languages import router as languages_router
+from api.metrics import router as metrics_router
+from api.stats import router as stats_router
 from api.translate import router as translate_router
 from core.config import settings
+from core.memory import get_memory_stats
+from core.redis import set_redis_client
 from core.logging import setup_logging
 from middleware.exception_handler import exception_handler
 from middleware.request_logger import request_logger
@@ -22,30 +27,46 @@ from middleware.request_logger import request_logger
 async def lifespan(app: FastAPI):
     logging.info("Starting app...")
 
-    logging.info("Setting up Redis for rate limiting...")
+    logging.info("Setting up Redis...")
+
+    redis_client = redis.from_url(
+        settings.redis_url
+        or str("redis://:" + settings.redis_password + "@redis:6379"),
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout_seconds,
+        socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        health_check_interval=30,
+    )
+    set_redis_client(redis_client)
 
     try:
-        redis_client = redis.from_url(
-            str("redis://:" + settings.redis_password + "@redis:6379"),
-            encoding="utf-8",
-            decode_responses=True,
+        await redis_client.ping()
+    except RedisError as exc:
+        logging.warning(
+            f"Redis unavailable, rate limits fall back to per-worker: {exc}"
         )
-        await FastAPILimiter.init(redis_client)
-    except Exception as exc:
-        logging.warning("Redis unavailable, API will return 500: %s", exc)
 
     logging.info(
         "Initializing models... This may take a while if running for the first time."
     )
     init_models()
 
-    redis_client = None
+    memory = get_memory_stats()
+    logging.info(
+        f"worker_memory pid={memory['pid']} rss_mb={memory.get('rss_mb')} "
+        f"pss_mb={memory.get('pss_mb')} shared_mb={memory.get('shared_mb')} "
+        f"private_mb={memory.get('private_mb')}"
+    )
 
     logging.info("App started.")
     yield
 
-    if redis_client:
-        await redis_client.close()
+    set_redis_client(None)
+    await redis_client.aclose()
+
+    await close_openai_client()
 
     logging.info("App shutdown complete.")
 
@@ -75,7 +96,9 @@ def create_app() -> FastAPI:
 
         app.include_router(health_router, prefix="/api")
         app.include_router(languages_router, prefix="/api")
+        app.include_router(stats_router, prefix="/api")
         app.include_router(translate_router, prefix="/api")
+        app.include_router(metrics_router)
 
         logging.info("FastAPI app is ready.")
         return app
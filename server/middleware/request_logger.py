@@ -3,20 +3,36 @@ import time
 import uuid
 from fastapi import Request, Response
 
+from core.metrics import http_request_seconds, http_requests_in_flight
+from core.tracing import Trace, export_trace, start_trace
+
 logger = logging.getLogger("request_logger")
 
 
+def _observe(request: Request, status: int, duration: float) -> None:
+    # Label by route template rather than raw path to keep cardinality bounded.
+    route = request.scope.get("route")
+    http_request_seconds.labels(
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(status),
+    ).observe(duration)
+
+
 async def request_logger(
     request: Request,
     call_next,
 ) -> Response:
     request_id = uuid.uuid4().hex
     start_time = time.monotonic()
+    trace = start_trace(request_id)
 
+    http_requests_in_flight.inc()
     try:
         response = await call_next(request)
     except Exception:
         duration = time.monotonic() - start_time
+        _observe(request, 500, duration)
         logger.exception(
             f"request_failed "
             f"request_id={request_id} "
@@ -25,11 +41,23 @@ async def request_logger(
             f"duration={duration:.4f}s"
         )
         raise
+    finally:
+        http_requests_in_flight.dec()
 
     duration = time.monotonic() - start_time
+    _observe(request, response.status_code, duration)
 
     response.headers["X-Request-ID"] = request_id
 
+    if trace is not None:
+        # Streamed bodies are produced after the headers are sent, so the
+        # header only covers what finished before the response started; the
+        # exported trace is completed once the body has been sent.
+        response.headers["Server-Timing"] = trace.server_timing(duration)
+        response.body_iterator = _finish_trace(
+            request, response, response.body_iterator, trace
+        )
+
     logger.info(
         f"request_completed "
         f"request_id={request_id} "
@@ -40,3 +68,17 @@ async def request_logger(
     )
 
     return response
+
+
+async def _finish_trace(
+    request: Request, response: Response, body_iterator, trace: Trace
+):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        export_trace(
+            trace,
+            f"{request.method} {request.url.path}",
+            {"http.method": request.method, "http.status_code": response.status_code},
+        )
@@ -1,7 +1,33 @@
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+from core.config import ProfileName, settings
+
+TEXT_MAX_LENGTH = 100
 
 
 class TranslateRequest(BaseModel):
-    text: str = Field(max_length=100)
+    text: str = Field(max_length=settings.document_max_chars)
+    source_language: str = Field(max_length=3)
+    target_language: str = Field(max_length=3)
+    profile: ProfileName | None = None
+    mode: Literal["text", "document"] = "text"
+
+    @model_validator(mode="after")
+    def check_text_length(self):
+        if self.mode == "text" and len(self.text) > TEXT_MAX_LENGTH:
+            raise ValueError(
+                f"text must be at most {TEXT_MAX_LENGTH} characters, "
+                'use mode "document" for longer input'
+            )
+        return self
+
+
+class TranslateBatchRequest(BaseModel):
+    texts: list[Annotated[str, Field(max_length=TEXT_MAX_LENGTH)]] = Field(
+        min_length=1, max_length=settings.translate_batch_max_items
+    )
     source_language: str = Field(max_length=3)
-    target_language: str = Field(max_length=3)
\ No newline at end of file
+    target_language: str = Field(max_length=3)
+    profile: ProfileName | None = None
@@ -1,14 +1,31 @@
 from pydantic import BaseModel
 from typing import Literal
 
+
 class ScriptText(BaseModel):
     script: Literal["latin", "arabic"]
     text: str
 
+
 class TranslateSingleTextResponse(BaseModel):
     language: str
     text: str
+    profile: str | None = None
+    degraded: bool = False
+
 
 class TranslateMultiTextResponse(BaseModel):
     language: str
-    variants: list[ScriptText]
\ No newline at end of file
+    variants: list[ScriptText]
+    profile: str | None = None
+    degraded: bool = False
+
+
+class TranslateBatchItem(BaseModel):
+    index: int
+    result: TranslateSingleTextResponse | TranslateMultiTextResponse | None = None
+    error: str | None = None
+
+
+class TranslateBatchResponse(BaseModel):
+    results: list[TranslateBatchItem]
@@ -0,0 +1,147 @@
+# Converts the translation checkpoints to CTranslate2 in CT2_MODEL_DIR and checks
+# parity with PyTorch. Run from the server directory:
+#
+#     python -m scripts.convert_ctranslate2 [--check-only]
+
+import argparse
+import importlib.util
+import json
+import time
+from pathlib import Path
+
+import ctranslate2
+from ctranslate2.converters import TransformersConverter
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+from core.config import settings
+from services.translation.decoding import DECODING_PROFILES
+from services.translation.hf_client import (
+    _generate_batch,
+    ctranslate2_model_path,
+    translation_model_ids,
+)
+
+ML_CONFIG_PATH = Path(__file__).resolve().parents[2] / "ml" / "config.py"
+
+DIRECTIONS = {
+    "d2e": ("ary_Arab", "eng_Latn", "TEST_DARIJA_SENTENCES"),
+    "e2d": ("eng_Latn", "ary_Arab", "TEST_ENGLISH_SENTENCES"),
+}
+
+
+def load_test_sentences() -> dict[str, list[str]]:
+    spec = importlib.util.spec_from_file_location("ml_config", ML_CONFIG_PATH)
+    ml_config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ml_config)
+
+    return {
+        direction: getattr(ml_config, sentences_attr)
+        for direction, (_, _, sentences_attr) in DIRECTIONS.items()
+    }
+
+
+def convert(model_id: str, quantization: str, force: bool) -> str:
+    output_dir = ctranslate2_model_path(model_id)
+    if Path(output_dir).is_dir() and not force:
+        print(f"{model_id}: already converted at {output_dir}")
+        return output_dir
+
+    print(f"{model_id}: converting to {output_dir} ({quantization})...")
+    TransformersConverter(model_id).convert(
+        output_dir, quantization=quantization, force=force
+    )
+    return output_dir
+
+
+def check_parity(
+    model_id: str,
+    src_lang: str,
+    tgt_lang: str,
+    sentences: list[str],
+    compute_type: str,
+) -> dict:
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    tokenizer.src_lang = src_lang
+
+    torch_model = AutoModelForSeq2SeqLM.from_pretrained(model_id).eval()
+    translator = ctranslate2.Translator(
+        ctranslate2_model_path(model_id),
+        device="cpu",
+        compute_type=compute_type,
+    )
+
+    profile = DECODING_PROFILES["quality"]
+
+    start = time.perf_counter()
+    torch_outputs = _generate_batch(
+        tokenizer, torch_model, sentences, tgt_lang, profile
+    )
+    torch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ct2_outputs = _generate_batch(tokenizer, translator, sentences, tgt_lang, profile)
+    ct2_seconds = time.perf_counter() - start
+
+    matches = sum(a == b for a, b in zip(torch_outputs, ct2_outputs))
+
+    return {
+        "model_id": model_id,
+        "compute_type": compute_type,
+        "exact_match_rate": round(matches / len(sentences), 3),
+        "torch_seconds": round(torch_seconds, 3),
+        "ctranslate2_seconds": round(ct2_seconds, 3),
+        "speedup": round(torch_seconds / ct2_seconds, 2) if ct2_seconds else None,
+        "sentences": [
+            {"source": source, "torch": torch_output, "ctranslate2": ct2_output}
+            for source, torch_output, ct2_output in zip(
+                sentences, torch_outputs, ct2_outputs
+            )
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the translation models to CTranslate2 and check parity"
+    )
+    parser.add_argument(
+        "--quantization",
+        default=settings.ct2_compute_type,
+        help="CTranslate2 weight quantization (default: CT2_COMPUTE_TYPE)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Overwrite existing conversions"
+    )
+    parser.add_argument(
+        "--check-only", action="store_true", help="Skip conversion, only compare"
+    )
+    parser.add_argument(
+        "--skip-check", action="store_true", help="Skip the PyTorch parity check"
+    )
+    args = parser.parse_args()
+
+    model_ids = translation_model_ids()
+
+    if not args.check_only:
+        for model_id in dict.fromkeys(model_ids.values()):
+            convert(model_id, args.quantization, args.force)
+
+    if args.skip_check:
+        return
+
+    test_sentences = load_test_sentences()
+    report = {
+        direction: check_parity(
+            model_ids[direction],
+            src_lang,
+            tgt_lang,
+            test_sentences[direction],
+            args.quantization,
+        )
+        for direction, (src_lang, tgt_lang, _) in DIRECTIONS.items()
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, TypeVar
+
+from core.tracing import Span, Trace, current_traces, use_traces
+from services.translation.executor import InferenceExecutor, InferenceQueueFull
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# (item, future, traces of the submitting request, enqueue time)
+_Pending = tuple[T, Future, tuple[Trace, ...], float]
+
+
+class BatchStats:
+    def __init__(self, max_batch_size: int):
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._sizes: dict[int, int] = {}
+        self._flush_seconds = 0.0
+
+    def record(self, size: int, duration: float) -> None:
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._sizes[size] = self._sizes.get(size, 0) + 1
+            self._flush_seconds += duration
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            avg_size = items / batches if batches else 0.0
+            return {
+                "max_batch_size": self.max_batch_size,
+                "batches": batches,
+                "items": items,
+                "avg_batch_size": round(avg_size, 3),
+                "avg_occupancy": round(avg_size / self.max_batch_size, 3),
+                "avg_flush_seconds": (
+                    round(self._flush_seconds / batches, 4) if batches else 0.0
+                ),
+                "batch_sizes": dict(sorted(self._sizes.items())),
+            }
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[list[T]], list[R]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        executor: InferenceExecutor | None = None,
+        max_queue_size: int | None = None,
+    ):
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.stats = BatchStats(self.max_batch_size)
+
+        self.max_queue_size = max_queue_size
+
+        self._batch_fn = batch_fn
+        self._executor = executor
+        self._queue: queue.Queue[_Pending] = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._pid: int | None = None
+        self._slots: threading.Semaphore | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: T) -> Future:
+        self._ensure_worker()
+
+        if self.max_queue_size is not None and self.queue_depth >= self.max_queue_size:
+            raise InferenceQueueFull(
+                f"Batch queue '{self.name}' is full ({self.max_queue_size} pending items)."
+            )
+
+        future: Future = Future()
+        self._queue.put((item, future, current_traces(), time.perf_counter()))
+        return future
+
+    def _worker_running(self) -> bool:
+        return (
+            self._worker is not None
+            and self._pid == os.getpid()
+            and self._worker.is_alive()
+        )
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so a worker is started lazily per process,
+        # and restarted if it ever dies.
+        if self._worker_running():
+            return
+
+        with self._lock:
+            if self._worker_running():
+                return
+
+            if self._pid != os.getpid():
+                # Items queued before a fork belong to the parent.
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            if self._executor is not None:
+                self._slots = threading.Semaphore(self._executor.max_workers)
+            self._worker = threading.Thread(
+                target=self._run,
+                name=f"batcher-{self.name}",
+                daemon=True,
+            )
+            self._worker.start()
+
+    def _collect(self) -> list[_Pending]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        # A restarted worker gets a fresh semaphore; batches still running keep
+        # releasing the one they acquired.
+        slots = self._slots
+        while True:
+            if self._executor is None:
+                self._flush(self._collect())
+                continue
+
+            # Only collect once a worker is free for the batch; requests keep
+            # queueing meanwhile, so the next batch comes out fuller instead of
+            # a stream of tiny batches piling up in the executor queue.
+            slots.acquire()
+            batch = self._collect()
+
+            try:
+                future = self._executor.submit(self._flush, batch)
+            except Exception as exc:
+                # Queue full, or the executor is shut down: fail this batch
+                # without taking the worker thread down with it.
+                if not isinstance(exc, InferenceQueueFull):
+                    logger.exception(f"batch_submit_failed batcher={self.name}")
+                slots.release()
+                for _, future, _, _ in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(exc)
+                continue
+
+            future.add_done_callback(lambda _: slots.release())
+
+    def _flush(self, batch: list[_Pending]) -> None:
+        batch = [
+            pending for pending in batch if pending[1].set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+
+        items = [item for item, _, _, _ in batch]
+        start = time.monotonic()
+
+        traces: dict[int, Trace] = {}
+        flush_start = time.perf_counter()
+        for _, _, item_traces, enqueued_at in batch:
+            for trace in item_traces:
+                traces[id(trace)] = trace
+                trace.add(
+                    Span(
+                        "batch_queue",
+                        enqueued_at,
+                        flush_start - enqueued_at,
+                        {"batcher": self.name, "batch_size": len(items)},
+                    )
+                )
+
+        try:
+            with use_traces(tuple(traces.values())):
+                results = self._batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"Batch function for {self.name} returned {len(results)} "
+                    f"results for {len(items)} inputs."
+                )
+        except Exception as exc:
+            logger.exception(f"batch_failed batcher={self.name} size={len(items)}")
+            for _, future, _, _ in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            self.stats.record(len(items), time.monotonic() - start)
+
+        for (_, future, _, _), result in zip(batch, results):
+            future.set_result(result)
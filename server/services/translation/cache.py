@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis_client
+from services.translation.hf_client import is_transliteration_model_loaded
+
+logger = logging.getLogger(__name__)
+
+CACHE_SCHEMA_VERSION = 4
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def normalize_document(text: str) -> str:
+    # Like normalize_text, but line breaks separate sentences in documents and
+    # are kept (blank lines collapsed to one paragraph break).
+    lines = [
+        " ".join(line.split())
+        for line in unicodedata.normalize("NFKC", text).splitlines()
+    ]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def make_cache_key(
+    text: str,
+    source_language: str,
+    target_language: str,
+    profile: str,
+    mode: str = "text",
+) -> str:
+    payload = json.dumps(
+        [
+            CACHE_SCHEMA_VERSION,
+            normalize_document(text) if mode == "document" else normalize_text(text),
+            mode,
+            source_language,
+            target_language,
+            profile,
+            settings.inference_backend,
+            settings.ct2_compute_type,
+            settings.d2e_model_id,
+            settings.e2d_model_id,
+            settings.bidirectional_model_id,
+            settings.translation_model_id,
+            settings.pivot_backend,
+            settings.pivot_openai_refinement,
+            # The backend that actually runs: OpenAI when the local model
+            # failed to load, whatever TRANSLITERATION_BACKEND says.
+            "local" if is_transliteration_model_loaded() else "openai",
+            settings.transliteration_model_id,
+            settings.openai_translation_model,
+            settings.openai_transliteration_model,
+        ],
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"translation:{digest}"
+
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TranslationCache:
+    def __init__(
+        self,
+        local: TTLCache,
+        redis_enabled: bool,
+        redis_ttl_seconds: int,
+    ):
+        self.local = local
+        self.redis_enabled = redis_enabled
+        self.redis_ttl_seconds = redis_ttl_seconds
+
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    async def get(self, key: str) -> Any | None:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        redis_client = get_redis_client()
+        if not self.redis_enabled or redis_client is None:
+            return None
+
+        try:
+            raw = await redis_client.get(key)
+        except RedisError as exc:
+            self.redis_errors += 1
+            logger.warning(f"cache_redis_get_failed key={key} error={exc}")
+            return None
+
+        if raw is None:
+            self.redis_misses += 1
+            return None
+
+        self.redis_hits += 1
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def peek(self, key: str) -> Any | None:
+        # Reads the shared cache without touching the hit/miss counters, for
+        # polling while another worker computes the value.
+        redis_client = get_redis_client()
+        if not self.redis_enabled or redis_client is None:
+            return None
+
+        try:
+            raw = await redis_client.get(key)
+        except RedisError as exc:
+            self.redis_errors += 1
+            logger.warning(f"cache_redis_get_failed key={key} error={exc}")
+            return None
+
+        if raw is None:
+            return None
+
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+
+        redis_client = get_redis_client()
+        if not self.redis_enabled or redis_client is None:
+            return
+
+        try:
+            await redis_client.set(
+                key,
+                json.dumps(value, ensure_ascii=False),
+                ex=self.redis_ttl_seconds,
+            )
+        except RedisError as exc:
+            self.redis_errors += 1
+            logger.warning(f"cache_redis_set_failed key={key} error={exc}")
+
+    def snapshot(self) -> dict:
+        return {
+            "local": self.local.snapshot(),
+            "redis": {
+                "enabled": self.redis_enabled,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "errors": self.redis_errors,
+            },
+        }
+
+
+translation_cache = TranslationCache(
+    local=TTLCache(
+        max_entries=settings.cache_max_entries,
+        ttl_seconds=settings.cache_ttl_seconds,
+    ),
+    redis_enabled=settings.cache_redis_enabled,
+    redis_ttl_seconds=settings.cache_redis_ttl_seconds,
+)
+
+
+def get_cache_stats() -> dict:
+    return translation_cache.snapshot()
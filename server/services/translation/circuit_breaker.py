@@ -0,0 +1,68 @@
+import logging
+import time
+from typing import Literal
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state: Literal["closed", "open", "half_open"] = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probing = False
+
+        if self.state == "half_open":
+            # Only one request probes the upstream, the rest keep failing fast
+            # until it reports back.
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+
+        return True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"circuit_closed name={self.name}")
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self.state == "half_open" or (
+            self.state == "closed" and self._failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(f"circuit_opened name={self.name} failures={self._failures}")
+
+    def release(self) -> None:
+        # A probe that was cancelled says nothing about the upstream.
+        self._probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
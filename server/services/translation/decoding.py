@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+
+from core.config import settings
+
+
+@dataclass(frozen=True)
+class DecodingProfile:
+    name: str
+    num_beams: int
+    max_length_ratio: float
+    max_length_offset: int
+    max_new_tokens_cap: int = 512
+
+    def max_new_tokens(self, input_length: int) -> int:
+        return min(
+            self.max_new_tokens_cap,
+            int(input_length * self.max_length_ratio) + self.max_length_offset,
+        )
+
+
+DECODING_PROFILES: dict[str, DecodingProfile] = {
+    "fast": DecodingProfile(
+        "fast", num_beams=1, max_length_ratio=1.5, max_length_offset=8
+    ),
+    "balanced": DecodingProfile(
+        "balanced", num_beams=3, max_length_ratio=2.0, max_length_offset=10
+    ),
+    "quality": DecodingProfile(
+        "quality", num_beams=5, max_length_ratio=3.0, max_length_offset=16
+    ),
+}
+
+CHEAPER_PROFILE = {
+    "quality": "balanced",
+    "balanced": "fast",
+    "fast": "fast",
+}
+
+TRANSLITERATION_PROFILE = DecodingProfile(
+    "transliteration", num_beams=1, max_length_ratio=4.0, max_length_offset=16
+)
+
+
+def resolve_profile(requested: str | None, queue_depth: int) -> DecodingProfile:
+    # A profile the client asked for is honoured; only the default adapts to
+    # load.
+    if requested:
+        return DECODING_PROFILES[requested]
+
+    name = settings.decoding_default_profile
+    if settings.decoding_adaptive:
+        threshold = settings.decoding_downgrade_queue_depth
+        if queue_depth >= threshold:
+            name = CHEAPER_PROFILE[name]
+        if queue_depth >= 2 * threshold:
+            name = CHEAPER_PROFILE[name]
+
+    return DECODING_PROFILES[name]
@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class InferenceQueueFull(Exception):
+    pass
+
+
+class InferenceExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue_size: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Worker threads do not survive fork, so the pool is created per process.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=f"inference-{self.name}",
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._queued >= self.max_queue_size:
+                self._rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue '{self.name}' is full "
+                    f"({self.max_queue_size} pending tasks)."
+                )
+            self._queued += 1
+            self._submitted += 1
+            executor = self._get_executor()
+
+        enqueued_at = time.monotonic()
+        # Carry the caller's context (e.g. the active request trace) into the
+        # worker thread.
+        context = contextvars.copy_context()
+
+        def task():
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_seconds += wait
+                self._max_wait_seconds = max(self._max_wait_seconds, wait)
+            try:
+                return context.run(fn, *args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            return executor.submit(task)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": (
+                    round(self._wait_seconds / started, 4) if started else 0.0
+                ),
+                "max_wait_seconds": round(self._max_wait_seconds, 4),
+            }
@@ -1,7 +1,28 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import AsyncIterator, Literal
+
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import (
+    AsyncTextIteratorStreamer,
+    AutoTokenizer,
+    AutoModelForSeq2SeqLM,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
 from core.config import settings
-
+from core.metrics import model_loaded
+from core.tracing import span
+from services.translation.batching import MicroBatcher
+from services.translation.decoding import (
+    DECODING_PROFILES,
+    TRANSLITERATION_PROFILE,
+    DecodingProfile,
+)
+from services.translation.executor import InferenceExecutor
+from utils.languages import get_nllb_code
 
 DEVICE = (
     "cuda"
@@ -18,86 +39,656 @@ d2e_model = None
 e2d_tokenizer = None
 e2d_model = None
 
+translit_tokenizer = None
+translit_model = None
 
-def init_models() -> None:
-    global d2e_tokenizer, d2e_model, e2d_tokenizer, e2d_model
+pivot_tokenizer = None
+pivot_model = None
 
-    if d2e_model is not None:
+# Small seq2seq models sharing the NLLB vocabulary that propose tokens for the
+# d2e/e2d models to verify (assisted decoding).
+d2e_draft_model = None
+e2d_draft_model = None
+# NLLB picks the source language through tokenizer.src_lang, which is shared
+# state, so tokenizing for the pivot model is serialized.
+pivot_tokenizer_lock = threading.Lock()
 
+models_loaded_pid: int | None = None
+
+
+def init_transliteration_model() -> None:
+    global translit_tokenizer, translit_model
+
+    if translit_model is not None or settings.transliteration_backend != "local":
         return
 
-    d2e_tokenizer = AutoTokenizer.from_pretrained(settings.d2e_model_id)
-    d2e_tokenizer.src_lang = "ary_Arab"
+    try:
+        translit_tokenizer = AutoTokenizer.from_pretrained(
+            settings.transliteration_model_id
+        )
+        translit_model = (
+            AutoModelForSeq2SeqLM.from_pretrained(
+                settings.transliteration_model_id,
+                torch_dtype=DTYPE if DEVICE == "cuda" else None,
+            )
+            .to(DEVICE)
+            .eval()
+        )
+        model_loaded.labels(model="transliteration", backend="torch").set(1)
+    except Exception as exc:
+        translit_tokenizer = None
+        translit_model = None
+        logging.warning(
+            "Failed to load transliteration model %s, falling back to OpenAI: %s",
+            settings.transliteration_model_id,
+            exc,
+        )
+
+
+def ctranslate2_model_path(model_id: str) -> str:
+    return os.path.join(settings.ct2_model_dir, model_id.replace("/", "--"))
+
 
-    d2e_model = (
+def _load_translation_model(model_id: str):
+    if settings.inference_backend == "ctranslate2":
+        import ctranslate2
+
+        path = ctranslate2_model_path(model_id)
+        if not os.path.isdir(path):
+            raise RuntimeError(
+                f"CTranslate2 model for {model_id} not found at {path}. "
+                "Run `python -m scripts.convert_ctranslate2` first."
+            )
+
+        return ctranslate2.Translator(
+            path,
+            device="cuda" if DEVICE == "cuda" else "cpu",
+            compute_type=settings.ct2_compute_type,
+            inter_threads=settings.inference_max_workers,
+            intra_threads=settings.ct2_intra_threads,
+        )
+
+    return (
         AutoModelForSeq2SeqLM.from_pretrained(
-            settings.d2e_model_id,
+            model_id,
             torch_dtype=DTYPE if DEVICE == "cuda" else None,
         )
         .to(DEVICE)
         .eval()
     )
 
-    e2d_tokenizer = AutoTokenizer.from_pretrained(settings.e2d_model_id)
+
+def init_pivot_model() -> None:
+    global pivot_tokenizer, pivot_model
+
+    if pivot_model is not None or settings.pivot_backend != "nllb":
+        return
+
+    try:
+        pivot_tokenizer = AutoTokenizer.from_pretrained(settings.translation_model_id)
+        pivot_model = _load_translation_model(settings.translation_model_id)
+        model_loaded.labels(model="pivot", backend=settings.inference_backend).set(1)
+    except Exception as exc:
+        pivot_tokenizer = None
+        pivot_model = None
+        logging.warning(
+            "Failed to load pivot model %s, falling back to OpenAI: %s",
+            settings.translation_model_id,
+            exc,
+        )
+
+
+def _load_draft_model(model_id: str, target):
+    try:
+        draft = (
+            AutoModelForSeq2SeqLM.from_pretrained(
+                model_id,
+                torch_dtype=DTYPE if DEVICE == "cuda" else None,
+            )
+            .to(DEVICE)
+            .eval()
+        )
+    except Exception as exc:
+        logging.warning(
+            "Failed to load draft model %s, decoding without it: %s", model_id, exc
+        )
+        return None
+
+    # Draft tokens are verified by id, so both models need the same vocabulary.
+    if draft.config.vocab_size != target.config.vocab_size:
+        logging.warning(
+            "Draft model %s has a different vocabulary than its target, "
+            "decoding without it.",
+            model_id,
+        )
+        return None
+
+    draft.generation_config.num_assistant_tokens = settings.assisted_draft_tokens
+    draft.generation_config.num_assistant_tokens_schedule = (
+        settings.assisted_draft_schedule
+    )
+    return draft
+
+
+def translation_model_ids() -> dict[str, str]:
+    # A bidirectional checkpoint serves both directions; only the forced BOS
+    # language token differs between them.
+    if settings.bidirectional_model_id:
+        return {
+            "d2e": settings.bidirectional_model_id,
+            "e2d": settings.bidirectional_model_id,
+        }
+    return {"d2e": settings.d2e_model_id, "e2d": settings.e2d_model_id}
+
+
+def init_draft_models() -> None:
+    global d2e_draft_model, e2d_draft_model
+
+    if not settings.assisted_decoding_enabled:
+        return
+
+    if settings.inference_backend != "torch":
+        logging.warning("Assisted decoding is only supported by the torch backend.")
+        return
+
+    if settings.d2e_draft_model_id and d2e_draft_model is None:
+        d2e_draft_model = _load_draft_model(settings.d2e_draft_model_id, d2e_model)
+        if d2e_draft_model is not None:
+            model_loaded.labels(model="d2e_draft", backend="torch").set(1)
+
+    if settings.e2d_draft_model_id and e2d_draft_model is None:
+        if settings.e2d_draft_model_id == settings.d2e_draft_model_id:
+            e2d_draft_model = d2e_draft_model
+        else:
+            e2d_draft_model = _load_draft_model(settings.e2d_draft_model_id, e2d_model)
+        if e2d_draft_model is not None:
+            model_loaded.labels(model="e2d_draft", backend="torch").set(1)
+
+
+def init_models() -> None:
+    global d2e_tokenizer, d2e_model, e2d_tokenizer, e2d_model, models_loaded_pid
+
+    init_transliteration_model()
+    init_pivot_model()
+
+    if d2e_model is not None:
+        init_draft_models()
+        return
+
+    model_ids = translation_model_ids()
+
+    # Each direction keeps its own tokenizer so src_lang never has to be
+    # switched under a lock, even when both share one model.
+    d2e_tokenizer = AutoTokenizer.from_pretrained(model_ids["d2e"])
+    d2e_tokenizer.src_lang = "ary_Arab"
+    d2e_model = _load_translation_model(model_ids["d2e"])
+
+    e2d_tokenizer = AutoTokenizer.from_pretrained(model_ids["e2d"])
     e2d_tokenizer.src_lang = "eng_Latn"
+    if model_ids["e2d"] == model_ids["d2e"]:
+        e2d_model = d2e_model
+    else:
+        e2d_model = _load_translation_model(model_ids["e2d"])
 
-    e2d_model = (
-        AutoModelForSeq2SeqLM.from_pretrained(
-            settings.e2d_model_id,
-            torch_dtype=DTYPE if DEVICE == "cuda" else None,
+    models_loaded_pid = os.getpid()
+    model_loaded.labels(model="d2e", backend=settings.inference_backend).set(1)
+    model_loaded.labels(model="e2d", backend=settings.inference_backend).set(1)
+
+    init_draft_models()
+
+
+def preload_models() -> None:
+    # Called in the gunicorn master before fork so workers share the weights
+    # copy-on-write instead of each holding its own copy.
+    if settings.inference_backend == "ctranslate2":
+        logging.warning(
+            "CTranslate2 translators own native thread pools that do not survive "
+            "fork, translation models will be loaded in each worker."
         )
-        .to(DEVICE)
-        .eval()
+        init_transliteration_model()
+        return
+
+    init_models()
+
+
+def _tokenize(tokenizer, texts: list[str], src_lang: str | None, **kwargs):
+    if src_lang is None:
+        return tokenizer(texts, truncation=True, max_length=512, **kwargs)
+
+    with pivot_tokenizer_lock:
+        tokenizer.src_lang = src_lang
+        return tokenizer(texts, truncation=True, max_length=512, **kwargs)
+
+
+def _generate_batch_ctranslate2(
+    tokenizer,
+    translator,
+    texts: list[str],
+    tgt_lang: str | None,
+    profile: DecodingProfile,
+    src_lang: str | None = None,
+) -> list[str]:
+    with span("tokenize", batch_size=len(texts)):
+        source = [
+            tokenizer.convert_ids_to_tokens(ids)
+            for ids in _tokenize(tokenizer, texts, src_lang)["input_ids"]
+        ]
+
+    with span("generate", batch_size=len(texts), profile=profile.name):
+        results = translator.translate_batch(
+            source,
+            target_prefix=[[tgt_lang]] * len(texts) if tgt_lang else None,
+            beam_size=profile.num_beams,
+            max_decoding_length=profile.max_new_tokens(max(map(len, source))),
+        )
+
+    outputs = []
+    with span("decode", batch_size=len(texts)):
+        for result in results:
+            tokens = result.hypotheses[0]
+            if tgt_lang:
+                tokens = tokens[1:]
+            outputs.append(
+                tokenizer.decode(
+                    tokenizer.convert_tokens_to_ids(tokens),
+                    skip_special_tokens=True,
+                ).strip()
+            )
+    return outputs
+
+
+def _generate_batch(
+    tokenizer,
+    model,
+    texts: list[str],
+    tgt_lang: str | None,
+    profile: DecodingProfile,
+    src_lang: str | None = None,
+    draft_model=None,
+) -> list[str]:
+    if not isinstance(model, torch.nn.Module):
+        return _generate_batch_ctranslate2(
+            tokenizer, model, texts, tgt_lang, profile, src_lang
+        )
+
+    # Assisted generation verifies one greedy sequence at a time; beam search
+    # and larger batches keep using plain batched generation.
+    assisted = draft_model is not None and profile.num_beams == 1 and len(texts) == 1
+
+    with span("tokenize", batch_size=len(texts)):
+        inputs = _tokenize(
+            tokenizer,
+            texts,
+            src_lang,
+            return_tensors="pt",
+            padding=True,
+        ).to(DEVICE)
+
+    with span(
+        "generate", batch_size=len(texts), profile=profile.name, assisted=assisted
+    ):
+        with torch.no_grad():
+            output = model.generate(
+                **inputs,
+                forced_bos_token_id=(
+                    tokenizer.convert_tokens_to_ids(tgt_lang) if tgt_lang else None
+                ),
+                max_new_tokens=profile.max_new_tokens(inputs["input_ids"].shape[1]),
+                num_beams=profile.num_beams,
+                do_sample=False,
+                assistant_model=draft_model if assisted else None,
+            )
+
+    with span("decode", batch_size=len(texts)):
+        return [
+            text.strip()
+            for text in tokenizer.batch_decode(output, skip_special_tokens=True)
+        ]
+
+
+def translate_darija_to_english_batch(
+    texts: list[str], profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> list[str]:
+    if d2e_model is None:
+        raise RuntimeError("Models not initialized.")
+
+    return _generate_batch(
+        d2e_tokenizer,
+        d2e_model,
+        texts,
+        "eng_Latn",
+        profile,
+        draft_model=d2e_draft_model,
     )
 
 
-def translate_darija_to_english(text: str) -> str:
+def translate_english_to_darija_batch(
+    texts: list[str], profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> list[str]:
+    if e2d_model is None:
+        raise RuntimeError("Models not initialized.")
+
+    return _generate_batch(
+        e2d_tokenizer,
+        e2d_model,
+        texts,
+        "ary_Arab",
+        profile,
+        draft_model=e2d_draft_model,
+    )
+
+
+def transliterate_latin_to_arabic_batch(texts: list[str]) -> list[str]:
+    if translit_model is None:
+        raise RuntimeError("Transliteration model not initialized.")
+
+    return _generate_batch(
+        translit_tokenizer, translit_model, texts, None, TRANSLITERATION_PROFILE
+    )
+
+
+def translate_pivot_batch(
+    texts: list[str],
+    src_lang: str,
+    tgt_lang: str,
+    profile: DecodingProfile = DECODING_PROFILES["quality"],
+) -> list[str]:
+    if pivot_model is None:
+        raise RuntimeError("Pivot model not initialized.")
+
+    return _generate_batch(
+        pivot_tokenizer, pivot_model, texts, tgt_lang, profile, src_lang=src_lang
+    )
+
+
+def _grouped(batch_fn):
+    # Items are (text, *params). Requests with different parameters (decoding
+    # profile, language pair) can share a flush window, but each combination
+    # needs its own generate call.
+    def run(items: list[tuple]) -> list[str]:
+        results: list[str] = [""] * len(items)
+        groups: dict[tuple, list[int]] = {}
+        for index, (_, *params) in enumerate(items):
+            groups.setdefault(tuple(params), []).append(index)
+
+        for params, indices in groups.items():
+            outputs = batch_fn([items[index][0] for index in indices], *params)
+            for index, output in zip(indices, outputs):
+                results[index] = output
+        return results
+
+    return run
+
+
+def is_transliteration_model_loaded() -> bool:
+    return translit_model is not None
+
+
+def is_pivot_model_loaded() -> bool:
+    return pivot_model is not None
+
+
+inference_executor = InferenceExecutor(
+    "generate",
+    max_workers=settings.inference_max_workers,
+    max_queue_size=settings.inference_max_queue_size,
+)
+
+d2e_batcher = MicroBatcher(
+    "d2e",
+    _grouped(translate_darija_to_english_batch),
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    executor=inference_executor,
+    max_queue_size=settings.inference_max_queue_size,
+)
+
+e2d_batcher = MicroBatcher(
+    "e2d",
+    _grouped(translate_english_to_darija_batch),
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    executor=inference_executor,
+    max_queue_size=settings.inference_max_queue_size,
+)
+
+pivot_batcher = MicroBatcher(
+    "pivot",
+    _grouped(translate_pivot_batch),
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    executor=inference_executor,
+    max_queue_size=settings.inference_max_queue_size,
+)
+
+translit_batcher = MicroBatcher(
+    "transliterate",
+    transliterate_latin_to_arabic_batch,
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    executor=inference_executor,
+    max_queue_size=settings.inference_max_queue_size,
+)
+
+
+async def translate_darija_to_english(
+    text: str, profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> str:
     if d2e_model is None:
         raise RuntimeError("Models not initialized.")
 
-    inputs = d2e_tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512,
-    ).to(DEVICE)
-
-    with torch.no_grad():
-        output = d2e_model.generate(
-            **inputs,
-            forced_bos_token_id=d2e_tokenizer.convert_tokens_to_ids("eng_Latn"),
-            max_new_tokens=512,
-            num_beams=5,
-            do_sample=False,
-        )
+    return await asyncio.wrap_future(d2e_batcher.submit((text, profile)))
+
+
+async def translate_english_to_darija(
+    text: str, profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> str:
+    if e2d_model is None:
+        raise RuntimeError("Models not initialized.")
 
-    return d2e_tokenizer.decode(
-        output[0],
-        skip_special_tokens=True,
-    ).strip()
+    return await asyncio.wrap_future(e2d_batcher.submit((text, profile)))
 
 
-def translate_english_to_darija(text: str) -> str:
+async def translate_darija_to_english_many(
+    texts: list[str], profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> list[str]:
+    if d2e_model is None:
+        raise RuntimeError("Models not initialized.")
+
+    # Sentences of one document skip the micro-batcher and share a single
+    # generate call, so latency follows the longest sentence.
+    return await inference_executor.run(
+        translate_darija_to_english_batch, texts, profile
+    )
+
+
+async def translate_english_to_darija_many(
+    texts: list[str], profile: DecodingProfile = DECODING_PROFILES["quality"]
+) -> list[str]:
     if e2d_model is None:
         raise RuntimeError("Models not initialized.")
 
-    inputs = e2d_tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512,
-    ).to(DEVICE)
-
-    with torch.no_grad():
-        output = e2d_model.generate(
-            **inputs,
-            forced_bos_token_id=e2d_tokenizer.convert_tokens_to_ids("ary_Arab"),
-            max_new_tokens=512,
-            num_beams=5,
-            do_sample=False,
+    return await inference_executor.run(
+        translate_english_to_darija_batch, texts, profile
+    )
+
+
+def _pivot_codes(source_language: str, target_language: str) -> tuple[str, str]:
+    src_lang = get_nllb_code(source_language)
+    tgt_lang = get_nllb_code(target_language)
+    if src_lang is None or tgt_lang is None:
+        raise ValueError(f"No NLLB code for {source_language} or {target_language}.")
+    return src_lang, tgt_lang
+
+
+async def translate_pivot(
+    text: str,
+    source_language: str,
+    target_language: str,
+    profile: DecodingProfile = DECODING_PROFILES["quality"],
+) -> str:
+    if pivot_model is None:
+        raise RuntimeError("Pivot model not initialized.")
+
+    src_lang, tgt_lang = _pivot_codes(source_language, target_language)
+    return await asyncio.wrap_future(
+        pivot_batcher.submit((text, src_lang, tgt_lang, profile))
+    )
+
+
+async def translate_pivot_many(
+    texts: list[str],
+    source_language: str,
+    target_language: str,
+    profile: DecodingProfile = DECODING_PROFILES["quality"],
+) -> list[str]:
+    if pivot_model is None:
+        raise RuntimeError("Pivot model not initialized.")
+
+    src_lang, tgt_lang = _pivot_codes(source_language, target_language)
+    return await inference_executor.run(
+        translate_pivot_batch, texts, src_lang, tgt_lang, profile
+    )
+
+
+async def transliterate_latin_to_arabic(text: str) -> str:
+    if translit_model is None:
+        raise RuntimeError("Transliteration model not initialized.")
+
+    return await asyncio.wrap_future(translit_batcher.submit(text))
+
+
+# Token streaming only supports greedy decoding of a single sequence.
+STREAMING_PROFILE = DECODING_PROFILES["fast"]
+
+
+class _CancelledCriteria(StoppingCriteria):
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],),
+            self.cancelled.is_set(),
+            dtype=torch.bool,
+            device=input_ids.device,
         )
 
-    return e2d_tokenizer.decode(
-        output[0],
-        skip_special_tokens=True,
-    ).strip()
+
+async def stream_translation(
+    text: str,
+    direction: Literal["d2e", "e2d"],
+) -> AsyncIterator[str]:
+    if direction == "d2e":
+        tokenizer, model, tgt_lang = d2e_tokenizer, d2e_model, "eng_Latn"
+        draft_model = d2e_draft_model
+    else:
+        tokenizer, model, tgt_lang = e2d_tokenizer, e2d_model, "ary_Arab"
+        draft_model = e2d_draft_model
+
+    if model is None:
+        raise RuntimeError("Models not initialized.")
+
+    if not isinstance(model, torch.nn.Module):
+        # CTranslate2 models are not token-streamed; emit the batched result.
+        batcher = d2e_batcher if direction == "d2e" else e2d_batcher
+        yield await asyncio.wrap_future(batcher.submit((text, STREAMING_PROFILE)))
+        return
+
+    # The streamed path bypasses the batcher and runs one sequence at a time.
+    streamer = AsyncTextIteratorStreamer(tokenizer, skip_special_tokens=True)
+    cancelled = threading.Event()
+
+    def generate() -> None:
+        with span("tokenize", batch_size=1):
+            inputs = tokenizer(
+                text,
+                return_tensors="pt",
+                truncation=True,
+                max_length=512,
+            ).to(DEVICE)
+
+        with span(
+            "generate",
+            batch_size=1,
+            profile=STREAMING_PROFILE.name,
+            assisted=draft_model is not None,
+        ), torch.no_grad():
+            model.generate(
+                **inputs,
+                forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
+                max_new_tokens=STREAMING_PROFILE.max_new_tokens(
+                    inputs["input_ids"].shape[1]
+                ),
+                num_beams=STREAMING_PROFILE.num_beams,
+                do_sample=False,
+                assistant_model=draft_model,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([_CancelledCriteria(cancelled)]),
+            )
+
+    future = inference_executor.submit(generate)
+    future.add_done_callback(
+        lambda done: streamer.end() if done.exception() is not None else None
+    )
+
+    try:
+        async for chunk in streamer:
+            if chunk:
+                yield chunk
+        await asyncio.wrap_future(future)
+    finally:
+        cancelled.set()
+
+
+def get_batching_stats() -> dict:
+    return {
+        "d2e": {
+            **d2e_batcher.stats.snapshot(),
+            "queue_depth": d2e_batcher.queue_depth,
+        },
+        "e2d": {
+            **e2d_batcher.stats.snapshot(),
+            "queue_depth": e2d_batcher.queue_depth,
+        },
+        "pivot": {
+            **pivot_batcher.stats.snapshot(),
+            "queue_depth": pivot_batcher.queue_depth,
+        },
+        "transliterate": {
+            **translit_batcher.stats.snapshot(),
+            "queue_depth": translit_batcher.queue_depth,
+        },
+    }
+
+
+def get_inference_queue_depth() -> int:
+    return (
+        inference_executor.queue_depth
+        + d2e_batcher.queue_depth
+        + e2d_batcher.queue_depth
+        + pivot_batcher.queue_depth
+        + translit_batcher.queue_depth
+    )
+
+
+def get_inference_stats() -> dict:
+    return inference_executor.snapshot()
+
+
+def get_model_stats() -> dict:
+    return {
+        "inference_backend": settings.inference_backend,
+        "loaded": d2e_model is not None and e2d_model is not None,
+        "bidirectional": d2e_model is not None and d2e_model is e2d_model,
+        "transliteration_loaded": translit_model is not None,
+        "pivot_loaded": pivot_model is not None,
+        "draft_loaded": {
+            "d2e": d2e_draft_model is not None,
+            "e2d": e2d_draft_model is not None,
+        },
+        "loaded_pid": models_loaded_pid,
+        "preloaded": (
+            models_loaded_pid is not None and models_loaded_pid != os.getpid()
+        ),
+    }
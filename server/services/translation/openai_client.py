@@ -1,13 +1,295 @@
-from openai import OpenAI
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from core.config import settings
+from core.metrics import (
+    openai_circuit_open,
+    openai_errors_total,
+    openai_hedged_total,
+    openai_tokens_total,
+)
+from services.translation.circuit_breaker import CircuitBreaker
 from utils.languages import get_language_name
 
-client = OpenAI(api_key=settings.openai_api_key)
+
+class LatencyStats:
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._recent: deque[float] = deque(maxlen=window)
+        self._calls = 0
+        self._errors = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def record(self, duration: float, error: bool = False) -> None:
+        with self._lock:
+            self._calls += 1
+            self._errors += int(error)
+            self._total_seconds += duration
+            self._max_seconds = max(self._max_seconds, duration)
+            self._recent.append(duration)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            calls = self._calls
+
+        def percentile(q: float) -> float:
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))], 4)
+
+        return {
+            "calls": calls,
+            "errors": self._errors,
+            "avg_seconds": round(self._total_seconds / calls, 4) if calls else 0.0,
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+            "max_seconds": round(self._max_seconds, 4),
+        }
+
+
+class OpenAIUnavailableError(Exception):
+    pass
+
+
+client = AsyncOpenAI(
+    api_key=settings.openai_api_key,
+    base_url=settings.openai_base_url,
+    max_retries=settings.openai_max_retries,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry_seconds,
+        ),
+    ),
+)
+
+_concurrency = asyncio.Semaphore(settings.openai_max_concurrency)
+_in_flight = 0
+_waiting = 0
+
+latency_stats = {
+    "transliterate": LatencyStats(),
+    "translate": LatencyStats(),
+}
+
+stage_timeouts = {
+    "transliterate": settings.openai_transliterate_timeout_seconds,
+    "translate": settings.openai_translate_timeout_seconds,
+}
+
+hedge_stats = {stage: {"hedged": 0, "hedge_won": 0} for stage in latency_stats}
+
+circuit_breaker = CircuitBreaker(
+    "openai",
+    failure_threshold=settings.openai_breaker_failure_threshold,
+    reset_seconds=settings.openai_breaker_reset_seconds,
+)
+
+
+@asynccontextmanager
+async def _request_slot(stage: str, model: str):
+    global _in_flight, _waiting
+
+    _waiting += 1
+    try:
+        await _concurrency.acquire()
+    finally:
+        _waiting -= 1
+
+    _in_flight += 1
+    start = time.monotonic()
+    error = False
+    cancelled = False
+    try:
+        yield
+    except asyncio.CancelledError:
+        # Hedged attempts that lost the race are cancelled; their truncated
+        # duration would skew the latency percentiles.
+        cancelled = True
+        raise
+    except Exception as exc:
+        error = True
+        openai_errors_total.labels(
+            stage=stage, model=model, error=type(exc).__name__
+        ).inc()
+        raise
+    finally:
+        _in_flight -= 1
+        _concurrency.release()
+        if not cancelled:
+            latency_stats[stage].record(time.monotonic() - start, error=error)
+
+
+def _record_usage(stage: str, model: str, usage) -> None:
+    if usage is None:
+        return
+
+    openai_tokens_total.labels(stage=stage, model=model, kind="input").inc(
+        usage.input_tokens
+    )
+    openai_tokens_total.labels(stage=stage, model=model, kind="output").inc(
+        usage.output_tokens
+    )
+
+
+def _is_upstream_failure(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return False
+
+
+@asynccontextmanager
+async def _guarded(stage: str):
+    if not circuit_breaker.allow():
+        raise OpenAIUnavailableError("OpenAI circuit breaker is open.")
+
+    try:
+        yield
+    except Exception as exc:
+        if _is_upstream_failure(exc):
+            circuit_breaker.record_failure()
+            openai_circuit_open.set(int(circuit_breaker.state == "open"))
+            raise OpenAIUnavailableError(
+                f"OpenAI {stage} request failed: {type(exc).__name__}"
+            ) from exc
+        # The provider answered, the request itself was at fault.
+        circuit_breaker.record_success()
+        openai_circuit_open.set(0)
+        raise
+    except BaseException:
+        # Cancelled, or a stream closed early: nothing learned either way.
+        circuit_breaker.release()
+        raise
+    else:
+        circuit_breaker.record_success()
+        openai_circuit_open.set(0)
+
+
+def _hedge_delay(stage: str) -> float | None:
+    if not settings.openai_hedge_enabled:
+        return None
+
+    stats = latency_stats[stage].snapshot()
+    if stats["calls"] < settings.openai_hedge_min_samples:
+        return None
+
+    return max(stats["p95_seconds"], settings.openai_hedge_min_delay_seconds)
 
 
-def transliterate_darija_latin_to_arabic(text: str) -> str:
-    response = client.responses.create(
-        model="gpt-4.1-mini",
+async def _attempt(stage: str, kwargs: dict):
+    async with _request_slot(stage, kwargs["model"]):
+        # The timeout starts once a slot is free, so local queueing is not
+        # mistaken for a slow upstream.
+        async with asyncio.timeout(stage_timeouts[stage]):
+            return await client.responses.create(**kwargs)
+
+
+async def _hedged(stage: str, kwargs: dict):
+    delay = _hedge_delay(stage)
+    if delay is None:
+        return await _attempt(stage, kwargs)
+
+    first = asyncio.ensure_future(_attempt(stage, kwargs))
+    pending = {first}
+    hedged = False
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            # The first attempt is slower than 95% of recent calls: race a
+            # second one against it and keep whichever answers first.
+            hedged = True
+            hedge_stats[stage]["hedged"] += 1
+            pending.add(asyncio.ensure_future(_attempt(stage, kwargs)))
+
+        error = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if hedged:
+                        winner = "first" if task is first else "hedge"
+                        hedge_stats[stage]["hedge_won"] += int(task is not first)
+                        openai_hedged_total.labels(stage=stage, winner=winner).inc()
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                break
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+
+        if hedged:
+            openai_hedged_total.labels(stage=stage, winner="none").inc()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _create_response(stage: str, **kwargs):
+    async with _guarded(stage):
+        response = await _hedged(stage, kwargs)
+
+    _record_usage(stage, kwargs["model"], getattr(response, "usage", None))
+    return response
+
+
+async def _stream_response(stage: str, **kwargs) -> AsyncIterator[str]:
+    # Streams are never hedged: the caller has already seen the first tokens.
+    # The deadline is checked per event rather than with asyncio.timeout, which
+    # would also cancel whatever the caller awaits between events.
+    async with _guarded(stage):
+        async with _request_slot(stage, kwargs["model"]):
+            deadline = time.monotonic() + stage_timeouts[stage]
+            stream = await asyncio.wait_for(
+                client.responses.create(stream=True, **kwargs),
+                deadline - time.monotonic(),
+            )
+            events = aiter(stream)
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        anext(events), deadline - time.monotonic()
+                    )
+                except StopAsyncIteration:
+                    break
+
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed":
+                    _record_usage(stage, kwargs["model"], event.response.usage)
+
+
+async def close_client() -> None:
+    await client.close()
+
+
+def get_openai_stats() -> dict:
+    return {
+        "max_concurrency": settings.openai_max_concurrency,
+        "in_flight": _in_flight,
+        "waiting": _waiting,
+        "stages": {stage: stats.snapshot() for stage, stats in latency_stats.items()},
+        "hedging": hedge_stats,
+        "circuit_breaker": circuit_breaker.snapshot(),
+    }
+
+
+async def transliterate_darija_latin_to_arabic(text: str) -> str:
+    response = await _create_response(
+        "transliterate",
+        model=settings.openai_transliteration_model,
         temperature=0,
         instructions=(
             "You are a Moroccan Darija linguist.\n"
@@ -25,15 +307,16 @@ def transliterate_darija_latin_to_arabic(text: str) -> str:
     return response.output_text.strip()
 
 
-def translate(
+def _build_translation_prompt(
     source_language: str,
     target_language: str,
     source_text: str,
     english_reference: str = "",
+    draft_translation: str = "",
 ) -> str:
     source_language_name = get_language_name(lang_code=source_language)
     target_language_name = get_language_name(lang_code=target_language)
-    prompt = f"""
+    return f"""
 You are a professional human translator.
 
 Your task is to TRANSLATE the source text from {source_language_name}
@@ -66,13 +349,57 @@ ENGLISH REFERENCE (NON-AUTHORITATIVE, FOR DISAMBIGUATION ONLY):
 \"\"\"{english_reference}\"\"\"
 '''
 }
+{draft_translation and f'''
+DRAFT TRANSLATION (MACHINE-GENERATED, MAY CONTAIN ERRORS):
+Correct and improve this draft rather than starting from scratch.
+\"\"\"{draft_translation}\"\"\"
+'''
+}
 """
 
-    response = client.responses.create(
-        model="gpt-4.1",
+
+async def translate(
+    source_language: str,
+    target_language: str,
+    source_text: str,
+    english_reference: str = "",
+    draft_translation: str = "",
+) -> str:
+    response = await _create_response(
+        "translate",
+        model=settings.openai_translation_model,
         temperature=0.2,
         max_output_tokens=400,
-        input=prompt,
+        input=_build_translation_prompt(
+            source_language,
+            target_language,
+            source_text,
+            english_reference,
+            draft_translation,
+        ),
     )
 
     return response.output_text.strip()
+
+
+async def translate_stream(
+    source_language: str,
+    target_language: str,
+    source_text: str,
+    english_reference: str = "",
+    draft_translation: str = "",
+) -> AsyncIterator[str]:
+    async for delta in _stream_response(
+        "translate",
+        model=settings.openai_translation_model,
+        temperature=0.2,
+        max_output_tokens=400,
+        input=_build_translation_prompt(
+            source_language,
+            target_language,
+            source_text,
+            english_reference,
+            draft_translation,
+        ),
+    ):
+        yield delta
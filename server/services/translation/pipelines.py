@@ -1,10 +1,130 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator
+
+from core.config import settings
+from core.metrics import degraded_responses_total, observe_stage, pipeline_timer
+from core.tracing import record_span
+from services.translation.decoding import DecodingProfile
 from services.translation.hf_client import (
+    STREAMING_PROFILE,
+    is_pivot_model_loaded,
+    is_transliteration_model_loaded,
+    stream_translation,
     translate_darija_to_english,
+    translate_darija_to_english_many,
     translate_english_to_darija,
+    translate_english_to_darija_many,
+    translate_pivot,
+    translate_pivot_many,
+)
+from services.translation.openai_client import (
+    OpenAIUnavailableError,
+    translate,
+    translate_stream,
+)
+from services.translation.segmentation import (
+    Segment,
+    join_sentences,
+    split_sentences,
 )
-from services.translation.openai_client import translate
-from services.translation.transliteration import transliterate_darija
-from utils.languages import is_supported_language
+from services.translation.transliteration import transliterate_darija_with_backend
+from utils.languages import get_nllb_code, is_supported_language
+
+logger = logging.getLogger(__name__)
+
+STAGE_BACKENDS = {
+    "transliterate_to_arabic": settings.transliteration_backend,
+    "transliterate_to_latin": "rules",
+    "nllb_d2e": settings.inference_backend,
+    "nllb_e2d": settings.inference_backend,
+    "nllb_pivot": settings.inference_backend,
+    "llm": "openai",
+}
+
+
+def _record_stage(
+    pipeline: str,
+    stage: str,
+    source_language: str,
+    target_language: str,
+    backend: str,
+    start: float,
+    seconds: float,
+) -> None:
+    observe_stage(pipeline, stage, source_language, target_language, backend, seconds)
+    record_span(stage, start, seconds, pipeline=pipeline, backend=backend)
+
+
+@contextmanager
+def _stage(pipeline: str, stage: str, source_language: str, target_language: str):
+    # Stages that only learn which backend served them while running
+    # overwrite labels["backend"].
+    labels = {"backend": STAGE_BACKENDS[stage]}
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        _record_stage(
+            pipeline,
+            stage,
+            source_language,
+            target_language,
+            labels["backend"],
+            start,
+            time.perf_counter() - start,
+        )
+
+
+async def _stream_stage(
+    pipeline: str,
+    stage: str,
+    source_language: str,
+    target_language: str,
+    stream: AsyncIterator[str],
+) -> AsyncIterator[str]:
+    # Only time spent waiting on the model counts. Time suspended at yield is
+    # the SSE client reading, which says nothing about the stage.
+    start = time.perf_counter()
+    busy = 0.0
+    try:
+        while True:
+            resumed = time.perf_counter()
+            try:
+                delta = await anext(stream)
+            except StopAsyncIteration:
+                return
+            finally:
+                busy += time.perf_counter() - resumed
+            yield delta
+    finally:
+        _record_stage(
+            pipeline,
+            stage,
+            source_language,
+            target_language,
+            STAGE_BACKENDS[stage],
+            start,
+            busy,
+        )
+
+
+async def _transliterate(
+    pipeline: str,
+    text: str,
+    direction: str,
+    source_language: str,
+    target_language: str,
+) -> str:
+    with _stage(
+        pipeline, f"transliterate_{direction}", source_language, target_language
+    ) as labels:
+        text, labels["backend"] = await transliterate_darija_with_backend(
+            text, direction
+        )
+    return text
 
 
 def _check_supported_language(lang_code: str):
@@ -12,61 +132,432 @@ def _check_supported_language(lang_code: str):
         raise ValueError(f"Unsupported language code: {lang_code}")
 
 
-def darija_to_language(text: str, target_language: str) -> dict:
-    _check_supported_language(target_language)
+def _split_document(text: str) -> list[Segment]:
+    segments = split_sentences(text, settings.document_max_sentence_chars)
+    if len(segments) > settings.document_max_sentences:
+        raise ValueError(
+            f"Document has {len(segments)} sentences, "
+            f"the limit is {settings.document_max_sentences}."
+        )
+    return segments
 
-    darija_arabic = transliterate_darija(text, direction="to_arabic")
 
-    english = translate_darija_to_english(darija_arabic)
+def _use_local_pivot() -> bool:
+    return settings.pivot_backend == "nllb" and is_pivot_model_loaded()
 
-    translation = translate(
-        source_language="ary",
-        target_language=target_language,
-        source_text=darija_arabic,
-        english_reference=english,
-    )
 
-    return {"language": target_language, "text": translation}
+def _degrade(pipeline: str, exc: Exception) -> None:
+    logger.warning(f"pipeline_degraded pipeline={pipeline} error={exc}")
+    degraded_responses_total.labels(pipeline=pipeline).inc()
 
 
-def language_to_darija(text: str, source_language: str) -> dict:
-    _check_supported_language(source_language)
+def _script(lang_code: str) -> str:
+    return "arabic" if (get_nllb_code(lang_code) or "").endswith("_Arab") else "latin"
 
-    english = translate(
-        source_language=source_language,
-        target_language="en",
-        source_text=text,
-    )
 
-    darija_arabic = translate_english_to_darija(english)
+async def _to_english(
+    pipeline: str, text: str, source_language: str, profile: DecodingProfile
+) -> tuple[str, bool]:
+    # Returns the English text and whether it is a local-only fallback.
+    if not _use_local_pivot():
+        # Without a local pivot there is nothing to fall back to.
+        with _stage(pipeline, "llm", source_language, "ary"):
+            english = await translate(
+                source_language=source_language,
+                target_language="en",
+                source_text=text,
+            )
+        return english, False
 
-    darija_latin = transliterate_darija(darija_arabic, direction="to_latin")
+    with _stage(pipeline, "nllb_pivot", source_language, "ary"):
+        english = await translate_pivot(text, source_language, "en", profile)
 
-    return {
-        "language": "ary",
-        "variants": [
-            {"script": "arabic", "text": darija_arabic},
-            {"script": "latin", "text": darija_latin},
-        ],
-    }
+    if not settings.pivot_openai_refinement:
+        return english, False
+
+    try:
+        with _stage(pipeline, "llm", source_language, "ary"):
+            refined = await translate(
+                source_language=source_language,
+                target_language="en",
+                source_text=text,
+                draft_translation=english,
+            )
+    except OpenAIUnavailableError as exc:
+        _degrade(pipeline, exc)
+        return english, True
+
+    return refined, False
 
 
-def darija_to_english(text: str) -> dict:
-    darija_arabic = transliterate_darija(text, direction="to_arabic")
-    english = translate_darija_to_english(darija_arabic)
+async def _from_english(
+    pipeline: str,
+    darija_arabic: str,
+    english: str,
+    target_language: str,
+    profile: DecodingProfile,
+) -> dict:
+    draft = ""
+    if _use_local_pivot():
+        with _stage(pipeline, "nllb_pivot", "ary", target_language):
+            draft = await translate_pivot(english, "en", target_language, profile)
 
-    return {"language": "en", "text": english}
+        if not settings.pivot_openai_refinement:
+            return _text_result(target_language, draft, profile.name)
 
+    try:
+        with _stage(pipeline, "llm", "ary", target_language):
+            translation = await translate(
+                source_language="ary",
+                target_language=target_language,
+                source_text=darija_arabic,
+                english_reference=english,
+                draft_translation=draft,
+            )
+    except OpenAIUnavailableError as exc:
+        # Without an NLLB draft there is nothing in the target language to
+        # fall back to, so the request fails as unavailable.
+        if not draft:
+            raise
+        _degrade(pipeline, exc)
+        return _text_result(target_language, draft, profile.name, degraded=True)
 
-def english_to_darija(text: str) -> dict:
-    darija_arabic = translate_english_to_darija(text)
+    return _text_result(target_language, translation, profile.name)
+
+
+def _text_result(
+    language: str, text: str, profile: str, degraded: bool = False
+) -> dict:
+    return {
+        "language": language,
+        "text": text,
+        "profile": profile,
+        "degraded": degraded,
+    }
 
-    darija_latin = transliterate_darija(darija_arabic, direction="to_latin")
 
+def _darija_result(
+    darija_arabic: str, darija_latin: str, profile: str, degraded: bool = False
+) -> dict:
     return {
         "language": "ary",
         "variants": [
             {"script": "arabic", "text": darija_arabic},
             {"script": "latin", "text": darija_latin},
         ],
+        "profile": profile,
+        "degraded": degraded,
     }
+
+
+async def darija_to_language(
+    text: str, target_language: str, profile: DecodingProfile
+) -> dict:
+    _check_supported_language(target_language)
+
+    pipeline = "darija_to_language"
+    with pipeline_timer(pipeline, "ary", target_language):
+        darija_arabic = await _transliterate(
+            pipeline, text, "to_arabic", "ary", target_language
+        )
+
+        with _stage(pipeline, "nllb_d2e", "ary", target_language):
+            english = await translate_darija_to_english(darija_arabic, profile)
+
+        return await _from_english(
+            pipeline, darija_arabic, english, target_language, profile
+        )
+
+
+async def language_to_darija(
+    text: str, source_language: str, profile: DecodingProfile
+) -> dict:
+    _check_supported_language(source_language)
+
+    pipeline = "language_to_darija"
+    with pipeline_timer(pipeline, source_language, "ary"):
+        english, degraded = await _to_english(pipeline, text, source_language, profile)
+
+        with _stage(pipeline, "nllb_e2d", source_language, "ary"):
+            darija_arabic = await translate_english_to_darija(english, profile)
+
+        darija_latin = await _transliterate(
+            pipeline, darija_arabic, "to_latin", source_language, "ary"
+        )
+
+    return _darija_result(darija_arabic, darija_latin, profile.name, degraded)
+
+
+async def darija_to_english(text: str, profile: DecodingProfile) -> dict:
+    pipeline = "darija_to_english"
+    with pipeline_timer(pipeline, "ary", "en"):
+        darija_arabic = await _transliterate(pipeline, text, "to_arabic", "ary", "en")
+
+        with _stage(pipeline, "nllb_d2e", "ary", "en"):
+            english = await translate_darija_to_english(darija_arabic, profile)
+
+    return _text_result("en", english, profile.name)
+
+
+async def english_to_darija(text: str, profile: DecodingProfile) -> dict:
+    pipeline = "english_to_darija"
+    with pipeline_timer(pipeline, "en", "ary"):
+        with _stage(pipeline, "nllb_e2d", "en", "ary"):
+            darija_arabic = await translate_english_to_darija(text, profile)
+
+        darija_latin = await _transliterate(
+            pipeline, darija_arabic, "to_latin", "en", "ary"
+        )
+
+    return _darija_result(darija_arabic, darija_latin, profile.name)
+
+
+async def darija_document_to_language(
+    text: str, target_language: str, profile: DecodingProfile
+) -> dict:
+    if target_language != "en":
+        _check_supported_language(target_language)
+
+    segments = _split_document(text)
+
+    pipeline = "darija_document_to_language"
+    with pipeline_timer(pipeline, "ary", target_language):
+        if is_transliteration_model_loaded():
+            # Sentences share one generate call through the batcher.
+            with _stage(
+                pipeline, "transliterate_to_arabic", "ary", target_language
+            ) as labels:
+                results = await asyncio.gather(
+                    *(
+                        transliterate_darija_with_backend(
+                            segment.source, direction="to_arabic"
+                        )
+                        for segment in segments
+                    )
+                )
+                labels["backend"] = ",".join(
+                    sorted({backend for _, backend in results})
+                )
+            darija_arabic = [arabic for arabic, _ in results]
+        else:
+            # One provider call for the whole document, split afterwards.
+            segments = _split_document(
+                await _transliterate(
+                    pipeline, text, "to_arabic", "ary", target_language
+                )
+            )
+            darija_arabic = [segment.source for segment in segments]
+
+        with _stage(pipeline, "nllb_d2e", "ary", target_language):
+            english_sentences = await translate_darija_to_english_many(
+                darija_arabic, profile
+            )
+
+        english = join_sentences(segments, english_sentences, "latin")
+        if target_language == "en":
+            return _text_result("en", english, profile.name)
+
+        if _use_local_pivot():
+            with _stage(pipeline, "nllb_pivot", "ary", target_language):
+                translation = await translate_pivot_many(
+                    english_sentences, "en", target_language, profile
+                )
+            translation = join_sentences(
+                segments, translation, _script(target_language)
+            )
+            if not settings.pivot_openai_refinement:
+                return _text_result(target_language, translation, profile.name)
+        else:
+            translation = ""
+
+        # The LLM sees the whole document at once, with the sentence-level
+        # NLLB output as reference.
+        try:
+            with _stage(pipeline, "llm", "ary", target_language):
+                refined = await translate(
+                    source_language="ary",
+                    target_language=target_language,
+                    source_text=join_sentences(segments, darija_arabic, "arabic"),
+                    english_reference=english,
+                    draft_translation=translation,
+                )
+        except OpenAIUnavailableError as exc:
+            if not translation:
+                raise
+            _degrade(pipeline, exc)
+            return _text_result(
+                target_language, translation, profile.name, degraded=True
+            )
+
+    return _text_result(target_language, refined, profile.name)
+
+
+async def language_document_to_darija(
+    text: str, source_language: str, profile: DecodingProfile
+) -> dict:
+    if source_language != "en":
+        _check_supported_language(source_language)
+
+    pipeline = "language_document_to_darija"
+    degraded = False
+    with pipeline_timer(pipeline, source_language, "ary"):
+        if source_language == "en":
+            segments = _split_document(text)
+            english = [segment.source for segment in segments]
+        elif _use_local_pivot() and not settings.pivot_openai_refinement:
+            # Sentences stay aligned through both NLLB legs, so the output
+            # keeps the source document's separators.
+            segments = _split_document(text)
+            with _stage(pipeline, "nllb_pivot", source_language, "ary"):
+                english = await translate_pivot_many(
+                    [segment.source for segment in segments],
+                    source_language,
+                    "en",
+                    profile,
+                )
+        else:
+            english, degraded = await _to_english(
+                pipeline, text, source_language, profile
+            )
+            segments = _split_document(english)
+            english = [segment.source for segment in segments]
+
+        with _stage(pipeline, "nllb_e2d", source_language, "ary"):
+            darija_arabic = await translate_english_to_darija_many(english, profile)
+
+        darija_arabic = join_sentences(segments, darija_arabic, "arabic")
+
+        darija_latin = await _transliterate(
+            pipeline, darija_arabic, "to_latin", source_language, "ary"
+        )
+
+    return _darija_result(darija_arabic, darija_latin, profile.name, degraded)
+
+
+async def stream_darija_to_language(
+    text: str, target_language: str
+) -> AsyncIterator[tuple[str, dict]]:
+    _check_supported_language(target_language)
+
+    pipeline = "stream_darija_to_language"
+    with pipeline_timer(pipeline, "ary", target_language):
+        darija_arabic = await _transliterate(
+            pipeline, text, "to_arabic", "ary", target_language
+        )
+
+        with _stage(pipeline, "nllb_d2e", "ary", target_language):
+            english = await translate_darija_to_english(
+                darija_arabic, STREAMING_PROFILE
+            )
+
+        draft = ""
+        if _use_local_pivot():
+            with _stage(pipeline, "nllb_pivot", "ary", target_language):
+                draft = await translate_pivot(
+                    english, "en", target_language, STREAMING_PROFILE
+                )
+
+        result = None
+        if draft and not settings.pivot_openai_refinement:
+            translation = draft
+            yield "token", {"stage": "nllb", "text": draft}
+        else:
+            translation = ""
+            try:
+                async for delta in _stream_stage(
+                    pipeline,
+                    "llm",
+                    "ary",
+                    target_language,
+                    translate_stream(
+                        source_language="ary",
+                        target_language=target_language,
+                        source_text=darija_arabic,
+                        english_reference=english,
+                        draft_translation=draft,
+                    ),
+                ):
+                    translation += delta
+                    yield "token", {"stage": "llm", "text": delta}
+            except OpenAIUnavailableError as exc:
+                # Tokens already sent cannot be taken back.
+                if translation or not draft:
+                    raise
+                _degrade(pipeline, exc)
+                result = _text_result(
+                    target_language, draft, STREAMING_PROFILE.name, degraded=True
+                )
+                yield "token", {"stage": "nllb", "text": draft}
+
+    yield "result", result or _text_result(
+        target_language, translation.strip(), STREAMING_PROFILE.name
+    )
+
+
+async def stream_language_to_darija(
+    text: str, source_language: str
+) -> AsyncIterator[tuple[str, dict]]:
+    _check_supported_language(source_language)
+
+    pipeline = "stream_language_to_darija"
+    with pipeline_timer(pipeline, source_language, "ary"):
+        english, degraded = await _to_english(
+            pipeline, text, source_language, STREAMING_PROFILE
+        )
+
+        darija_arabic = ""
+        async for delta in _stream_stage(
+            pipeline,
+            "nllb_e2d",
+            source_language,
+            "ary",
+            stream_translation(english, direction="e2d"),
+        ):
+            darija_arabic += delta
+            yield "token", {"stage": "nllb", "text": delta}
+
+        darija_arabic = darija_arabic.strip()
+        darija_latin = await _transliterate(
+            pipeline, darija_arabic, "to_latin", source_language, "ary"
+        )
+
+    yield "result", _darija_result(
+        darija_arabic, darija_latin, STREAMING_PROFILE.name, degraded
+    )
+
+
+async def stream_darija_to_english(text: str) -> AsyncIterator[tuple[str, dict]]:
+    pipeline = "stream_darija_to_english"
+    with pipeline_timer(pipeline, "ary", "en"):
+        darija_arabic = await _transliterate(pipeline, text, "to_arabic", "ary", "en")
+
+        english = ""
+        async for delta in _stream_stage(
+            pipeline,
+            "nllb_d2e",
+            "ary",
+            "en",
+            stream_translation(darija_arabic, direction="d2e"),
+        ):
+            english += delta
+            yield "token", {"stage": "nllb", "text": delta}
+
+    yield "result", _text_result("en", english.strip(), STREAMING_PROFILE.name)
+
+
+async def stream_english_to_darija(text: str) -> AsyncIterator[tuple[str, dict]]:
+    pipeline = "stream_english_to_darija"
+    with pipeline_timer(pipeline, "en", "ary"):
+        darija_arabic = ""
+        async for delta in _stream_stage(
+            pipeline, "nllb_e2d", "en", "ary", stream_translation(text, direction="e2d")
+        ):
+            darija_arabic += delta
+            yield "token", {"stage": "nllb", "text": delta}
+
+        darija_arabic = darija_arabic.strip()
+        darija_latin = await _transliterate(
+            pipeline, darija_arabic, "to_latin", "en", "ary"
+        )
+
+    yield "result", _darija_result(darija_arabic, darija_latin, STREAMING_PROFILE.name)
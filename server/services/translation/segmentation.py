@@ -0,0 +1,117 @@
+import re
+from dataclasses import dataclass
+from typing import Literal
+
+SENTENCE_PUNCTUATION = ".!?؟…"
+CLAUSE_PUNCTUATION = ",،;؛"
+
+# A sentence ends at terminal punctuation followed by whitespace (so "3.5" and
+# "www.site.ma" stay intact) or at a line break. Closing quotes and brackets
+# stay with the sentence they close.
+_SENTENCE_BOUNDARY = re.compile(r"[.!?؟…]+[\"'”»)\]]*(?=\s|$)\s*|\s*\n\s*")
+_CLAUSE_BOUNDARY = re.compile(r"[,،;؛](?=\s)\s*")
+
+_TO_ARABIC_PUNCTUATION = str.maketrans({"?": "؟", ",": "،", ";": "؛"})
+_TO_LATIN_PUNCTUATION = str.maketrans({"؟": "?", "،": ",", "؛": ";"})
+
+_TRAILING_PUNCTUATION = SENTENCE_PUNCTUATION + CLAUSE_PUNCTUATION + " \"'”»)]"
+
+
+@dataclass(frozen=True)
+class Segment:
+    text: str
+    terminator: str = ""
+    spacing: str = ""
+
+    @property
+    def source(self) -> str:
+        # The model sees the sentence with its punctuation, which carries
+        # meaning (questions, exclamations), but not the surrounding spacing.
+        return self.text + self.terminator
+
+
+def _split(text: str, boundary: re.Pattern) -> list[Segment]:
+    segments: list[Segment] = []
+    carry = ""
+    position = 0
+
+    for match in boundary.finditer(text):
+        body = text[position : match.start()]
+        separator = match.group()
+        terminator = separator.rstrip()
+        spacing = separator[len(terminator) :]
+        terminator = terminator.lstrip()
+        position = match.end()
+
+        if not body.strip():
+            # Punctuation or blank lines with no sentence before them stick to
+            # the previous sentence's separator.
+            if segments:
+                previous = segments[-1]
+                segments[-1] = Segment(
+                    previous.text, previous.terminator, previous.spacing + separator
+                )
+            else:
+                carry += separator
+            continue
+
+        segments.append(_segment(carry + body, terminator, spacing))
+        carry = ""
+
+    tail = text[position:]
+    if tail.strip():
+        segments.append(_segment(carry + tail, "", ""))
+
+    return segments
+
+
+def _segment(body: str, terminator: str, spacing: str) -> Segment:
+    # Line breaks carry no punctuation of their own, so any the line ends
+    # with becomes its terminator.
+    if not terminator:
+        stripped = body.rstrip(SENTENCE_PUNCTUATION + CLAUSE_PUNCTUATION)
+        if stripped.strip():
+            body, terminator = stripped, body[len(stripped) :]
+    return Segment(body, terminator, spacing)
+
+
+def split_sentences(text: str, max_sentence_chars: int) -> list[Segment]:
+    segments = []
+    for sentence in _split(text, _SENTENCE_BOUNDARY):
+        if len(sentence.text) <= max_sentence_chars:
+            segments.append(sentence)
+            continue
+
+        # Overlong sentences are cut at clause punctuation so that no single
+        # sequence dominates the batch.
+        clauses = _split(sentence.text, _CLAUSE_BOUNDARY)
+        last = clauses[-1]
+        clauses[-1] = Segment(
+            last.text,
+            last.terminator + sentence.terminator,
+            last.spacing + sentence.spacing,
+        )
+        segments.extend(clauses)
+
+    return segments or [Segment(text)]
+
+
+def join_sentences(
+    segments: list[Segment],
+    translations: list[str],
+    script: Literal["arabic", "latin"],
+) -> str:
+    table = _TO_ARABIC_PUNCTUATION if script == "arabic" else _TO_LATIN_PUNCTUATION
+
+    parts = []
+    for segment, translation in zip(segments, translations):
+        translation = translation.strip()
+        if segment.terminator:
+            # Keep the original punctuation rather than whatever the model
+            # produced, adapted to the output script.
+            translation = translation.rstrip(_TRAILING_PUNCTUATION)
+        parts.append(
+            translation + segment.terminator.translate(table) + segment.spacing
+        )
+
+    return "".join(parts).strip()
@@ -1,27 +1,237 @@
+import asyncio
+import hashlib
+from typing import AsyncIterator, Literal
+
+from core.config import settings
+from services.translation.cache import make_cache_key, translation_cache
+from services.translation.decoding import DecodingProfile, resolve_profile
+from services.translation.hf_client import (
+    STREAMING_PROFILE,
+    get_inference_queue_depth,
+)
 from services.translation.pipelines import (
+    darija_document_to_language,
     darija_to_english,
     darija_to_language,
     english_to_darija,
+    language_document_to_darija,
     language_to_darija,
+    stream_darija_to_english,
+    stream_darija_to_language,
+    stream_english_to_darija,
+    stream_language_to_darija,
 )
+from services.translation.segmentation import split_sentences
+from services.translation.singleflight import translation_flights
+
+
+async def _run_pipeline(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+    profile: DecodingProfile,
+):
+    if source_language == "ary":
+        return (
+            await darija_to_english(text, profile)
+            if target_language == "en"
+            else await darija_to_language(text, target_language, profile)
+        )
+
+    if target_language == "ary":
+        return (
+            await english_to_darija(text, profile)
+            if source_language == "en"
+            else await language_to_darija(text, source_language, profile)
+        )
+
+    raise ValueError(f"Unsupported translation: {source_language} → {target_language}")
+
+
+async def _run_document_pipeline(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+    profile: DecodingProfile,
+):
+    if source_language == "ary":
+        return await darija_document_to_language(text, target_language, profile)
+
+    if target_language == "ary":
+        return await language_document_to_darija(text, source_language, profile)
+
+    raise ValueError(f"Unsupported translation: {source_language} → {target_language}")
+
+
+async def _translate_cached(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+    profile: DecodingProfile,
+    mode: Literal["text", "document"] = "text",
+):
+    run_pipeline = _run_document_pipeline if mode == "document" else _run_pipeline
+    # The key is built from the normalized text, but the pipeline always gets
+    # the text as sent; normalization must not change what the model sees.
+    key = make_cache_key(text, source_language, target_language, profile.name, mode)
+
+    if settings.cache_enabled:
+        cached = await translation_cache.get(key)
+        if cached is not None:
+            return cached
 
+    async def compute():
+        result = await run_pipeline(
+            source_language=source_language,
+            target_language=target_language,
+            text=text,
+            profile=profile,
+        )
+        # Local-only fallbacks are served but not cached, so the full
+        # translation is produced once the provider recovers.
+        if settings.cache_enabled and not result.get("degraded"):
+            await translation_cache.set(key, result)
+        return result
+
+    if not settings.singleflight_enabled:
+        return await compute()
+
+    # Without the cache, only byte-identical requests share a result.
+    flight_key = key
+    if not settings.cache_enabled:
+        flight_key = f"{key}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    # Other workers can only hand over their result through the shared cache.
+    lookup = None
+    if (
+        settings.singleflight_redis_enabled
+        and settings.cache_enabled
+        and settings.cache_redis_enabled
+    ):
+        lookup = lambda: translation_cache.peek(key)
+
+    return await translation_flights.do(flight_key, compute, lookup=lookup)
+
+
+def request_cost(text: str, mode: Literal["text", "document"]) -> int:
+    # A document costs one rate limit unit per sentence, like a batch item.
+    if mode != "document":
+        return 1
+    sentences = len(split_sentences(text, settings.document_max_sentence_chars))
+    return max(1, min(sentences, settings.document_max_sentences))
 
-def translate_text(*, source_language: str, target_language: str, text: str):
+
+def _untranslated(text: str, language: str) -> dict:
+    return {"language": language, "text": text}
+
+
+async def translate_text(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+    profile: str | None = None,
+    mode: Literal["text", "document"] = "text",
+):
     if source_language == target_language:
-        return text
+        return _untranslated(text, target_language)
 
+    return await _translate_cached(
+        source_language=source_language,
+        target_language=target_language,
+        text=text,
+        profile=resolve_profile(profile, get_inference_queue_depth()),
+        mode=mode,
+    )
+
+
+async def translate_many(
+    *,
+    source_language: str,
+    target_language: str,
+    texts: list[str],
+    profile: str | None = None,
+) -> list[dict | Exception]:
+    if source_language == target_language:
+        return [_untranslated(text, target_language) for text in texts]
+
+    unique = list(dict.fromkeys(texts))
+
+    # The whole batch shares one profile so its items land in the same
+    # generate calls instead of being split as the queue fills up.
+    resolved = resolve_profile(profile, get_inference_queue_depth())
+
+    # Unique texts run concurrently so the micro-batchers can group their
+    # model stages into shared generate calls.
+    results = await asyncio.gather(
+        *(
+            _translate_cached(
+                source_language=source_language,
+                target_language=target_language,
+                text=text,
+                profile=resolved,
+            )
+            for text in unique
+        ),
+        return_exceptions=True,
+    )
+
+    by_text = dict(zip(unique, results))
+    return [by_text[text] for text in texts]
+
+
+def _stream_pipeline(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+) -> AsyncIterator[tuple[str, dict]]:
     if source_language == "ary":
         return (
-            darija_to_english(text)
+            stream_darija_to_english(text)
             if target_language == "en"
-            else darija_to_language(text, target_language)
+            else stream_darija_to_language(text, target_language)
         )
 
     if target_language == "ary":
         return (
-            english_to_darija(text)
+            stream_english_to_darija(text)
             if source_language == "en"
-            else language_to_darija(text, source_language)
+            else stream_language_to_darija(text, source_language)
         )
 
     raise ValueError(f"Unsupported translation: {source_language} → {target_language}")
+
+
+async def stream_translate_text(
+    *,
+    source_language: str,
+    target_language: str,
+    text: str,
+) -> AsyncIterator[tuple[str, dict | str]]:
+    if source_language == target_language:
+        yield "result", _untranslated(text, target_language)
+        return
+
+    # Every stage of a stream decodes with STREAMING_PROFILE, so a cached
+    # result for that profile is the same translation. Streamed output is
+    # served from the cache but never written to it.
+    if settings.cache_enabled:
+        cached = await translation_cache.get(
+            make_cache_key(
+                text, source_language, target_language, STREAMING_PROFILE.name
+            )
+        )
+        if cached is not None:
+            yield "result", cached
+            return
+
+    async for event in _stream_pipeline(
+        source_language=source_language,
+        target_language=target_language,
+        text=text,
+    ):
+        yield event
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.metrics import singleflight_coalesced_total
+from core.redis import get_redis_client
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: dict[str, asyncio.Task] = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_coalesced = 0
+        self.remote_timeouts = 0
+        self.lock_errors = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]] | None = None,
+    ) -> Any:
+        task = self._tasks.get(key)
+
+        if task is None:
+            self.leaders += 1
+            # The work runs in its own task so that the request which started
+            # it can disconnect without cancelling it for everyone else.
+            task = asyncio.ensure_future(self._lead(key, fn, lookup))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        singleflight_coalesced_total.labels(flight=self.name, scope="local").inc()
+        with span("singleflight_wait", scope="local"):
+            return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away.
+            task.exception()
+
+    async def _lead(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]] | None,
+    ) -> Any:
+        redis_client = get_redis_client()
+        if lookup is None or redis_client is None:
+            return await fn()
+
+        lock_key = f"singleflight:{self.name}:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await redis_client.set(
+                lock_key, token, nx=True, px=settings.singleflight_lock_ttl_ms
+            )
+        except RedisError as exc:
+            self.lock_errors += 1
+            logger.warning(f"singleflight_lock_failed key={key} error={exc}")
+            return await fn()
+
+        if acquired:
+            try:
+                return await fn()
+            finally:
+                try:
+                    await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except RedisError as exc:
+                    self.lock_errors += 1
+                    logger.warning(f"singleflight_unlock_failed key={key} error={exc}")
+
+        # Another worker holds the lock: wait for its result to show up in the
+        # shared cache, and do the work ourselves only if it never does.
+        with span("singleflight_wait", scope="remote"):
+            result = await self._wait_remote(redis_client, lock_key, lookup)
+
+        if result is not None:
+            self.remote_coalesced += 1
+            singleflight_coalesced_total.labels(flight=self.name, scope="remote").inc()
+            return result
+
+        return await fn()
+
+    async def _wait_remote(
+        self,
+        redis_client,
+        lock_key: str,
+        lookup: Callable[[], Awaitable[Any | None]],
+    ) -> Any | None:
+        deadline = time.monotonic() + settings.singleflight_lock_ttl_ms / 1000
+        interval = settings.singleflight_poll_interval_ms / 1000
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+
+            result = await lookup()
+            if result is not None:
+                return result
+
+            try:
+                if not await redis_client.exists(lock_key):
+                    # The holder finished without storing a result (failure).
+                    return await lookup()
+            except RedisError as exc:
+                self.lock_errors += 1
+                logger.warning(f"singleflight_poll_failed key={lock_key} error={exc}")
+                return None
+
+        self.remote_timeouts += 1
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "remote_coalesced": self.remote_coalesced,
+            "remote_timeouts": self.remote_timeouts,
+            "lock_errors": self.lock_errors,
+        }
+
+
+translation_flights = SingleFlight("translate")
+
+
+def get_singleflight_stats() -> dict:
+    return translation_flights.snapshot()
@@ -1,7 +1,15 @@
+import logging
 import re
 from typing import Literal
+
+from services.translation.hf_client import (
+    is_transliteration_model_loaded,
+    transliterate_latin_to_arabic,
+)
 from services.translation.openai_client import transliterate_darija_latin_to_arabic
 
+logger = logging.getLogger(__name__)
+
 
 ARABIC_PATTERN = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]")
 
@@ -10,105 +18,154 @@ def contains_arabic(text: str) -> bool:
     return bool(ARABIC_PATTERN.search(text))
 
 
-def transliterate_darija_arabic_to_latin(text: str) -> str:
-
-    def normalize_arabic(text: str) -> str:
-
-        diacritics = re.compile(r"[\u064B-\u065F\u0670]")
-        text = diacritics.sub("", text)
-
-        text = text.replace("أ", "ا")
-        text = text.replace("إ", "ا")
-        text = text.replace("آ", "ا")
-        text = text.replace("ٱ", "ا")
-
-        text = text.replace("ى", "ي")
-        text = text.replace("ئ", "ي")
-
-        text = text.replace("ؤ", "و")
-
-        text = text.replace("ـ", "")
-
-        return text
-
-    arabic_to_english_map = {
-        "ا": "a",
-        "ء": "2",
-        "ب": "b",
-        "ت": "t",
-        "ة": "a",
-        "ث": "th",
-        "ج": "j",
-        "ح": "7",
-        "خ": "kh",
-        "د": "d",
-        "ذ": "dh",
-        "ر": "r",
-        "ز": "z",
-        "س": "s",
-        "ش": "sh",
-        "ص": "s",
-        "ض": "d",
-        "ط": "t",
-        "ظ": "z",
-        "ع": "3",
-        "غ": "gh",
-        "ف": "f",
-        "ق": "9",
-        "ك": "k",
-        "ل": "l",
-        "م": "m",
-        "ن": "n",
-        "ه": "h",
-        "و": "ou",
-        "ي": "i",
-        "لا": "la",
-        " ": " ",
-        "؟": "?",
-        "،": ",",
-        "؛": ";",
-        "!": "!",
-        ".": ".",
-        ":": ":",
-        "-": "-",
-        "(": "(",
-        ")": ")",
+DIACRITICS = [chr(code) for code in range(0x064B, 0x0660)] + ["\u0670"]
+
+ARABIC_NORMALIZATION_MAP = {
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ى": "ي",
+    "ئ": "ي",
+    "ؤ": "و",
+    "ـ": "",
+    **{diacritic: "" for diacritic in DIACRITICS},
+}
+
+ARABIC_TO_LATIN_MAP = {
+    "ا": "a",
+    "ء": "2",
+    "ب": "b",
+    "ت": "t",
+    "ة": "a",
+    "ث": "th",
+    "ج": "j",
+    "ح": "7",
+    "خ": "kh",
+    "د": "d",
+    "ذ": "dh",
+    "ر": "r",
+    "ز": "z",
+    "س": "s",
+    "ش": "sh",
+    "ص": "s",
+    "ض": "d",
+    "ط": "t",
+    "ظ": "z",
+    "ع": "3",
+    "غ": "gh",
+    "ف": "f",
+    "ق": "9",
+    "ك": "k",
+    "ل": "l",
+    "م": "m",
+    "ن": "n",
+    "ه": "h",
+    "و": "ou",
+    "ي": "i",
+    "لا": "la",
+    "؟": "?",
+    "،": ",",
+    "؛": ";",
+}
+
+
+def _build_tables():
+    single = {key: value for key, value in ARABIC_TO_LATIN_MAP.items() if len(key) == 1}
+
+    # Multi-character keys only need a regex pass when their output differs
+    # from transliterating each character on its own.
+    multi = {
+        key: value
+        for key, value in ARABIC_TO_LATIN_MAP.items()
+        if len(key) > 1 and value != "".join(single.get(char, char) for char in key)
     }
 
-    normalized_text = normalize_arabic(text)
+    normalize_table = str.maketrans(ARABIC_NORMALIZATION_MAP)
+    single_table = str.maketrans(single)
+    combined_table = str.maketrans(
+        {
+            **single,
+            **{
+                char: "".join(single.get(c, c) for c in target)
+                for char, target in ARABIC_NORMALIZATION_MAP.items()
+            },
+        }
+    )
+
+    multi_pattern = (
+        re.compile(
+            "|".join(re.escape(key) for key in sorted(multi, key=len, reverse=True))
+        )
+        if multi
+        else None
+    )
+
+    return normalize_table, single_table, combined_table, multi, multi_pattern
+
+
+(
+    _NORMALIZE_TABLE,
+    _SINGLE_TABLE,
+    _TRANSLITERATION_TABLE,
+    _MULTI_CHAR_MAP,
+    _MULTI_CHAR_PATTERN,
+) = _build_tables()
+
+
+def transliterate_darija_arabic_to_latin(text: str) -> str:
+    if _MULTI_CHAR_PATTERN is None:
+        return text.translate(_TRANSLITERATION_TABLE)
+
+    text = text.translate(_NORMALIZE_TABLE)
 
     result = []
-    i = 0
-
-    while i < len(normalized_text):
-        matched = False
-
-        for length in range(3, 0, -1):
-            if i + length <= len(normalized_text):
-                substring = normalized_text[i : i + length]
-                if substring in arabic_to_english_map:
-                    result.append(arabic_to_english_map[substring])
-                    i += length
-                    matched = True
-                    break
-
-        if not matched:
-            char = normalized_text[i]
-            if char in arabic_to_english_map:
-                result.append(arabic_to_english_map[char])
-            else:
-                result.append(char)
-            i += 1
+    position = 0
+    for match in _MULTI_CHAR_PATTERN.finditer(text):
+        result.append(text[position : match.start()].translate(_SINGLE_TABLE))
+        result.append(_MULTI_CHAR_MAP[match.group()])
+        position = match.end()
+    result.append(text[position:].translate(_SINGLE_TABLE))
 
     return "".join(result)
 
 
-def transliterate_darija(text: str, direction: Literal["to_latin", "to_arabic"]) -> str:
+def transliterate_many(texts: list[str]) -> list[str]:
+    if not texts:
+        return []
+
+    if _MULTI_CHAR_PATTERN is None and not any("\n" in text for text in texts):
+        # A single translate pass over the joined batch avoids per-call overhead.
+        return "\n".join(texts).translate(_TRANSLITERATION_TABLE).split("\n")
+
+    return [transliterate_darija_arabic_to_latin(text) for text in texts]
+
+
+async def transliterate_darija_with_backend(
+    text: str, direction: Literal["to_latin", "to_arabic"]
+) -> tuple[str, str]:
+    # Returns the transliterated text and the backend that produced it, or
+    # "none" when the text is already in the target script.
     if direction == "to_latin":
         if not contains_arabic(text):
-            return text
-        return transliterate_darija_arabic_to_latin(text)
+            return text, "none"
+        return transliterate_darija_arabic_to_latin(text), "rules"
     else:
         if contains_arabic(text):
-            return text
-        return transliterate_darija_latin_to_arabic(text)
+            return text, "none"
+        if is_transliteration_model_loaded():
+            # Model errors fall back to OpenAI; a full inference queue is
+            # overload and is surfaced as a 503 rather than moved to a paid
+            # provider.
+            try:
+                return await transliterate_latin_to_arabic(text), "local"
+            except RuntimeError as exc:
+                logger.warning(f"local_transliteration_failed error={exc}")
+        return await transliterate_darija_latin_to_arabic(text), "openai"
+
+
+async def transliterate_darija(
+    text: str, direction: Literal["to_latin", "to_arabic"]
+) -> str:
+    transliterated, _ = await transliterate_darija_with_backend(text, direction)
+    return transliterated
@@ -27,6 +27,33 @@ LANGUAGES: Final[dict[str, dict[str, str]]] = {
     "swh": {"en": "Swahili", "fr": "Swahili", "ar": "السواحيلية"},
 }
 
+NLLB_CODES: Final[dict[str, str]] = {
+    "ary": "ary_Arab",
+    "en": "eng_Latn",
+    "fra": "fra_Latn",
+    "arb": "arb_Arab",
+    "spa": "spa_Latn",
+    "deu": "deu_Latn",
+    "ita": "ita_Latn",
+    "por": "por_Latn",
+    "rus": "rus_Cyrl",
+    "zho": "zho_Hans",
+    "jpn": "jpn_Jpan",
+    "kor": "kor_Hang",
+    "hin": "hin_Deva",
+    "ind": "ind_Latn",
+    "vie": "vie_Latn",
+    "tur": "tur_Latn",
+    "dut": "nld_Latn",
+    "pol": "pol_Latn",
+    "ukr": "ukr_Cyrl",
+    "heb": "heb_Hebr",
+    "urd": "urd_Arab",
+    "tam": "tam_Taml",
+    "tha": "tha_Thai",
+    "swh": "swh_Latn",
+}
+
 
 def is_supported_language(lang_code: str) -> bool:
     return lang_code in LANGUAGES
@@ -39,5 +66,9 @@ def get_language_name(
     return LANGUAGES.get(lang_code, {}).get(display_lang)
 
 
+def get_nllb_code(lang_code: str) -> str | None:
+    return NLLB_CODES.get(lang_code)
+
+
 def get_supported_languages() -> dict[str, dict[str, str]]:
     return LANGUAGES